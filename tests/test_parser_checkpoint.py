@@ -0,0 +1,102 @@
+import sys
+import shutil
+import tempfile
+import unittest
+from os import path
+
+import numpy as np
+
+# main.py imports constants and sanity as top-level modules
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), "wikimap"))
+
+from wikimap.parser import DumpParser
+
+
+def page(id, title, text, ns=0, redirect=None):
+    redirect = f'    <redirect title="{redirect}" />\n' if redirect else ""
+    return (f"  <page>\n    <title>{title}</title>\n    <ns>{ns}</ns>\n    <id>{id}</id>\n{redirect}"
+            f"    <revision>\n      <text xml:space=\"preserve\">{text}</text>\n    </revision>\n  </page>\n")
+
+
+# Titles differing only by case share their lowercase key, the later page overwrites the earlier one
+PAGES = [
+    page(1, "Abc", "[[Def]] [[Ghi]] [[Category:Letters]]"),
+    page(2, "Def", "[[Abc]] [[Category:Letters]]"),
+    page(3, "ABC", "[[Def]] [[Jkl]] [[Category:Capitals]]"),
+    page(4, "Ghi", "[[ABC]] [[Alias]]"),
+    page(5, "Jkl", "[[abc]] [[Category:Letters]]"),
+    page(6, "Alias", "#REDIRECT [[Def]]", redirect="Def"),
+    page(7, "ALIAS", "#REDIRECT [[Ghi]]", redirect="Ghi"),
+    page(8, "Category:Letters", "[[Category:Writing]]", ns=14),
+    page(9, "Category:LETTERS", "[[Category:Symbols]]", ns=14),
+    page(10, "Mno", "[[Alias]] [[Jkl]] [[Category:Capitals]]"),
+    page(11, "Category:Capitals", "[[Category:Letters]]", ns=14),
+]
+
+DUMP = ('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/">\n'
+        "  <siteinfo>\n    <namespaces>\n"
+        '      <namespace key="0" case="first-letter" />\n'
+        '      <namespace key="14" case="first-letter">Category</namespace>\n'
+        "    </namespaces>\n  </siteinfo>\n" + "".join(PAGES) + "</mediawiki>\n")
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptedDumpParser(DumpParser):
+    # Stops the parse before the page number interrupt_at, as a killed process would
+    interrupt_at = None
+
+    def _process_page(self, elem):
+        self.processed = getattr(self, "processed", 0) + 1
+        if self.processed == self.interrupt_at:
+            raise Interrupted()
+        super()._process_page(elem)
+
+
+class TestParserCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.dump_path = path.join(self.directory, "dump.xml")
+        with open(self.dump_path, "w", encoding="utf-8") as f:
+            f.write(DUMP)
+        self.checkpoint_path = path.join(self.directory, "checkpoint")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def assertSameParse(self, expected, actual):
+        self.assertEqual(expected.get_edges(), actual.get_edges())
+        self.assertEqual(expected.get_reverse_nodes(), actual.get_reverse_nodes())
+        self.assertEqual(expected.get_titles_original_case(), actual.get_titles_original_case())
+        self.assertEqual(expected.get_aliases_counts(), actual.get_aliases_counts())
+        self.assertEqual((expected.get_pages_count(), expected.get_redirect_pages_count()),
+                         (actual.get_pages_count(), actual.get_redirect_pages_count()))
+        expected_index = expected.get_category_index()
+        actual_index = actual.get_category_index()
+        self.assertEqual(expected_index.names, actual_index.names)
+        for name in ("page_ids", "members_indptr", "members", "children_indptr", "children"):
+            np.testing.assert_array_equal(getattr(expected_index, name), getattr(actual_index, name))
+
+    def test_resumed_parse_matches_uninterrupted_parse(self):
+        expected = DumpParser(self.dump_path, with_categories=True)
+        for interval in (1, 2, 3):
+            for interrupt_at in range(interval + 1, len(PAGES) + 1):
+                with self.subTest(interval=interval, interrupt_at=interrupt_at):
+                    InterruptedDumpParser.interrupt_at = interrupt_at
+                    with self.assertRaises(Interrupted):
+                        InterruptedDumpParser(self.dump_path, True, self.checkpoint_path, interval)
+                    self.assertTrue(path.exists(path.join(self.checkpoint_path, "manifest.json")))
+
+                    resumed = DumpParser(self.dump_path, True, self.checkpoint_path, interval)
+                    self.assertSameParse(expected, resumed)
+                    self.assertFalse(path.exists(self.checkpoint_path))
+
+    def test_uninterrupted_checkpointed_parse_matches_plain_parse(self):
+        self.assertSameParse(DumpParser(self.dump_path, with_categories=True),
+                             DumpParser(self.dump_path, True, self.checkpoint_path, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
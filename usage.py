@@ -49,11 +49,10 @@ print(f"Top 10 Out Degrees: {top_10_out_degrees}")
 print(f"Top 10 In Degrees: {top_10_in_degrees}")
 print(f"Out/In Degrees execution time: {time.time() - start_time} seconds")
 
-# Measure execution time for Louvain community detection on directed graph
+# Measure execution time for Louvain community detection on the undirected graph (cached after the first run)
 start_time = time.time()
-undirected_graph = graph.as_undirected()
-communities = undirected_graph.community_multilevel()
-print(f"Number of communities: {len(communities)}")
+community_graph = wm.community_graph()
+print(f"Number of communities: {community_graph.vcount()}")
 print(f"Louvain community detection execution time: {time.time() - start_time} seconds")
 
 # # get graph diameter and on which nodes it is reached
@@ -1,9 +1,13 @@
 #  import WikiMap class
 from .main import WikiMap
+from .batch import WikiBatch
+from .server import WikiGraphServer
 from .constants.language import WikiLanguage
 from .constants.graph_format import WikiGraphFormat
 from .constants.sanity_check_mode import WikiSanityCheckMode
+from .constants.partition_strategy import WikiPartitionStrategy
 # from .graph import Graph
 # from .downloader import Downloader
 # from .processor import Processor
-# from .analyzer import Analyzer
+from .analyzer import Analyzer
+from .snapshot_diff import WikiSnapshotDiff
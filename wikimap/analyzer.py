@@ -1,6 +1,101 @@
+import time
+import hashlib
+from os import path, makedirs
+import numpy as np
+from igraph import Graph
+
+from .edge_batches import iter_edge_batches, edge_array
+
+
 class Analyzer:
-    def __init__(self, graph):
+    def __init__(self, graph: Graph, cache_directory: str = None):
         self.graph = graph
+        # Where the results computed once per snapshot are kept (e.g. the dump directory)
+        self.cache_directory = cache_directory
+        self.community_levels = None  # levels x vertices membership, coarsest level last
+        self.community_graphs = {}  # level -> condensed graph
+        self.edges = None  # (m, 2) edge array, only built for the condensed graphs
 
     def stats(self):
-        return 0, 0, 0
\ No newline at end of file
+        return 0, 0, 0
+
+    def communities(self, recompute: bool = False) -> np.ndarray:
+        # Hierarchical Louvain communities, computed once per snapshot and cached on disk
+        if self.community_levels is not None and not recompute:
+            return self.community_levels
+
+        start_time = time.time()
+        fingerprint = self.__fingerprint()
+        cache_path = path.join(self.cache_directory, "communities.npz") if self.cache_directory else None
+        if cache_path and path.exists(cache_path) and not recompute:
+            cached = np.load(cache_path)
+            if str(cached["fingerprint"]) == fingerprint:
+                self.community_levels = cached["levels"]
+                print(f"Communities loaded from {cache_path}")
+
+        if self.community_levels is None or recompute:
+            levels = self.graph.as_undirected().community_multilevel(return_levels=True)
+            self.community_levels = np.array([level.membership for level in levels], dtype=np.int32).reshape(-1, self.graph.vcount())
+            if cache_path:
+                makedirs(self.cache_directory, exist_ok=True)
+                np.savez_compressed(cache_path, levels=self.community_levels, fingerprint=fingerprint)
+            print(f"Communities computed in {time.time() - start_time:.2f} seconds")
+
+        # Expose every level as a vertex attribute, "community" being the coarsest one
+        for level, membership in enumerate(self.community_levels):
+            self.graph.vs[f"community_{level}"] = membership.tolist()
+        if len(self.community_levels):
+            self.graph.vs["community"] = self.community_levels[-1].tolist()
+        self.community_graphs = {}
+        print(f"{len(self.community_levels)} levels, {self.count_communities()} communities at the coarsest level")
+        return self.community_levels
+
+    def count_communities(self, level: int = -1) -> int:
+        levels = self.communities()
+        return int(levels[level].max()) + 1 if levels.size else 0
+
+    def community_graph(self, level: int = -1) -> Graph:
+        # Quotient graph: one vertex per community, edges weighted by the number of links between communities
+        levels = self.communities()
+        level = level % len(levels)
+        if level in self.community_graphs:
+            return self.community_graphs[level]
+
+        membership = levels[level].astype(np.int64)
+        count = int(membership.max()) + 1
+        edges = self.__edges()
+        sources = membership[edges[:, 0]]
+        targets = membership[edges[:, 1]]
+        internal = sources == targets
+
+        keys, weights = np.unique(sources[~internal] * count + targets[~internal], return_counts=True)
+        sizes = np.bincount(membership, minlength=count)
+        internal_edges = np.bincount(sources[internal], minlength=count)
+
+        # Each community is named after its member with the highest in-degree
+        indegrees = np.array(self.graph.indegree(), dtype=np.int64)
+        order = np.lexsort((indegrees, membership))
+        last = np.r_[membership[order][1:] != membership[order][:-1], True]
+        representatives = order[last]
+        titles = self.graph.vs["title"]
+
+        condensed = Graph(n=count, edges=np.column_stack((keys // count, keys % count)).tolist(), directed=self.graph.is_directed())
+        condensed.vs["title"] = [titles[i] for i in representatives]
+        condensed.vs["size"] = sizes.tolist()
+        condensed.vs["internal_edges"] = internal_edges.tolist()
+        condensed.es["weight"] = weights.tolist()
+        self.community_graphs[level] = condensed
+        return condensed
+
+    def __edges(self) -> np.ndarray:
+        if self.edges is None:
+            self.edges = edge_array(self.graph)
+        return self.edges
+
+    def __fingerprint(self) -> str:
+        # Identifies the snapshot: same articles and same links, the edges are hashed batch by batch
+        sha = hashlib.sha1(np.array(self.graph.vs["original_id"], dtype=np.int64).tobytes())
+        for sources, targets in iter_edge_batches(self.graph):
+            sha.update(sources.tobytes())
+            sha.update(targets.tobytes())
+        return sha.hexdigest()
@@ -0,0 +1,125 @@
+import bz2
+import time
+import hashlib
+from os import path
+from collections import OrderedDict
+import numpy as np
+from lxml import etree
+
+
+def title_hash(title: str) -> int:
+    # 64-bit hash of the lowercase title, the index keeps hashes instead of millions of strings
+    return int.from_bytes(hashlib.blake2b(title.lower().encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class WikiArticleReader:
+    def __init__(self, dump_path: str, index_path: str, cache_size: int = 8):
+        # dump_path: pages-articles-multistream.xml.bz2, index_path: pages-articles-multistream-index.txt.bz2
+        self.dump_path = dump_path
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self.streams = OrderedDict()  # stream offset -> {lowercase title: wikitext}, least recently used first
+
+        self.offsets = None  # Sorted byte offsets of the bz2 streams
+        self.hashes = None  # Sorted title hashes
+        self.hash_streams = None  # Stream number (position in offsets) of each hash
+        self.__load_index()
+
+    def get_text(self, title: str) -> str | None:
+        # Raw wikitext of the page, None if it is not in the dump
+        for stream in self.__find_streams(title):
+            text = self.__read_stream(stream).get(title.lower())
+            if text is not None:
+                return text
+        return None
+
+    def get_texts(self, titles: list[str]) -> dict:
+        # Batch variant: every stream is decompressed once, whatever the number of titles it contains
+        by_stream = {}
+        for title in titles:
+            for stream in self.__find_streams(title):
+                by_stream.setdefault(stream, []).append(title)
+
+        texts = {title: None for title in titles}
+        for stream in sorted(by_stream):
+            pages = self.__read_stream(stream)
+            for title in by_stream[stream]:
+                if texts[title] is None:
+                    texts[title] = pages.get(title.lower())
+        return texts
+
+    def __load_index(self):
+        # The index is read once and kept as arrays next to the index file
+        cache_path = self.index_path + ".npz"
+        if path.exists(cache_path) and path.getmtime(cache_path) >= path.getmtime(self.index_path):
+            data = np.load(cache_path)
+            self.offsets, self.hashes, self.hash_streams = data["offsets"], data["hashes"], data["hash_streams"]
+            return
+
+        start_time = time.time()
+        offsets = []
+        hashes = []
+        hash_streams = []
+        with bz2.open(self.index_path, "rt", encoding="utf-8") as f:
+            # Lines are offset:page_id:title, the title may contain colons
+            for line in f:
+                offset, _, title = line.rstrip("\n").split(":", 2)
+                offset = int(offset)
+                if not offsets or offsets[-1] != offset:
+                    offsets.append(offset)
+                hashes.append(title_hash(title))
+                hash_streams.append(len(offsets) - 1)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        hashes = np.array(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.hash_streams = np.array(hash_streams, dtype=np.int32)[order]
+        np.savez(cache_path, offsets=self.offsets, hashes=self.hashes, hash_streams=self.hash_streams)
+        print(f"Multistream index loaded in {time.time() - start_time:.2f} seconds: {len(self.hashes)} pages in {len(self.offsets)} streams")
+
+    def __find_streams(self, title: str) -> list[int]:
+        # Streams of every page sharing the title hash (almost always a single one)
+        h = np.uint64(title_hash(title))
+        start = np.searchsorted(self.hashes, h, side="left")
+        end = np.searchsorted(self.hashes, h, side="right")
+        return self.hash_streams[start:end].tolist()
+
+    def __read_stream(self, stream: int) -> dict:
+        offset = int(self.offsets[stream])
+        if offset in self.streams:
+            self.streams.move_to_end(offset)
+            return self.streams[offset]
+
+        # Only the bytes of this bz2 stream are read and decompressed
+        with open(self.dump_path, "rb") as f:
+            f.seek(offset)
+            if stream + 1 < len(self.offsets):
+                data = f.read(int(self.offsets[stream + 1]) - offset)
+            else:
+                data = f.read()
+        xml = bz2.decompress(data).strip()
+        # The last stream also closes the root element of the dump
+        if xml.endswith(b"</mediawiki>"):
+            xml = xml[:-len(b"</mediawiki>")]
+
+        pages = {}
+        root = etree.fromstring(b"<pages>" + xml + b"</pages>", etree.XMLParser(huge_tree=True))
+        for page in root:
+            title = None
+            text = None
+            for child in page:
+                tag = child.tag.split('}')[-1]
+                if tag == "title":
+                    title = child.text
+                elif tag == "revision":
+                    for rev_child in child:
+                        if rev_child.tag.split('}')[-1] == "text":
+                            text = rev_child.text or ""
+            if title is not None:
+                pages[title.lower()] = text
+
+        self.streams[offset] = pages
+        if len(self.streams) > self.cache_size:
+            self.streams.popitem(last=False)
+        return pages
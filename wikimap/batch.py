@@ -0,0 +1,169 @@
+import time
+from os import path, makedirs
+from datetime import datetime
+from threading import BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .constants.language import WikiLanguage
+from .constants.graph_format import WikiGraphFormat
+from .main import WikiMap
+
+# dumps.wikimedia.org rate limiting: at most 3 simultaneous connections per host
+MAX_HOST_CONNECTIONS = 3
+
+
+def _parse_job(language: WikiLanguage, date: datetime | str, directory: str, output_path: str, format: WikiGraphFormat, compression: bool):
+    # Runs in a worker process: parse the extracted dump and write the graph to disk
+    try:
+        wm = WikiMap(date=date, language=language, directory=directory)
+        wm.parse()
+        wm.save_graph(format, output_path, compression)
+        return wm.graph.vcount(), wm.graph.ecount()
+    except Exception as e:
+        # The error goes back to the batch pickled, some (lxml XMLSyntaxError) cannot be
+        raise Exception(f"{type(e).__name__}: {e}") from None
+
+
+class WikiBatchJob:
+    def __init__(self, language: WikiLanguage, date: datetime | str, directory: str, output_path: str):
+        self.language = language
+        self.date = date
+        self.directory = directory
+        self.output_path = output_path
+        self.wm = None
+        self.stage = "download"  # download -> extract -> parse -> done (or failed)
+        self.attempts = 0  # Failed attempts of the current stage
+        self.error = None
+        self.result = None  # (vertices count, edges count) once parsed
+
+    def __repr__(self):
+        return f"WikiBatchJob({self.language.value}, {self.date if isinstance(self.date, str) else self.date.strftime('%Y%m%d')}, {self.stage})"
+
+
+class WikiBatch:
+    def __init__(self, jobs: list[tuple[WikiLanguage, datetime | str]], output_directory: str = "graphs", data_directory: str = "data",
+                 format: WikiGraphFormat = WikiGraphFormat.CSV, compression: bool = False, max_downloads: int = 2, extract_workers: int = 2,
+                 parse_workers: int = 2, max_retries: int = 3, retry_delay: float = 30, max_connections: int = MAX_HOST_CONNECTIONS):
+        if max_connections > MAX_HOST_CONNECTIONS:
+            raise ValueError(f"max_connections should not exceed {MAX_HOST_CONNECTIONS} (dumps.wikimedia.org rate limiting)")
+        self.format = format
+        self.compression = compression
+        self.max_downloads = max_downloads
+        self.extract_workers = extract_workers
+        self.parse_workers = parse_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Shared by every download of the batch, whatever the number of dumps downloading at once
+        self.connection_budget = BoundedSemaphore(max_connections)
+
+        self.jobs = []
+        for language, date in jobs:
+            string_date = "latest" if date == "latest" else date.strftime("%Y%m%d")
+            directory = path.join(data_directory, language.value, string_date)
+            output_path = path.join(output_directory, f"{language.value}_{string_date}")
+            self.jobs.append(WikiBatchJob(language, date, directory, output_path))
+
+    def run(self) -> list[WikiBatchJob]:
+        start_time = time.time()
+        print(f"Starting batch of {len(self.jobs)} dumps")
+        for directory in {path.dirname(job.output_path) for job in self.jobs}:
+            if directory:
+                makedirs(directory, exist_ok=True)
+
+        running = {}  # future -> job
+        retries = []  # [(retry_at, job)]
+        with ThreadPoolExecutor(max_workers=self.max_downloads) as download_pool, \
+                ThreadPoolExecutor(max_workers=self.extract_workers) as extract_pool, \
+                ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+            pools = {"download": download_pool, "extract": extract_pool, "parse": parse_pool}
+
+            for job in self.jobs:
+                self.__submit(pools, running, job)
+
+            while running or retries:
+                # Resubmit the failed stages whose delay is over
+                now = time.time()
+                due = [job for retry_at, job in retries if retry_at <= now]
+                retries = [(retry_at, job) for retry_at, job in retries if retry_at > now]
+                for job in due:
+                    self.__submit(pools, running, job)
+                if not running:
+                    time.sleep(max(0, min(retry_at for retry_at, _ in retries) - time.time()))
+                    continue
+
+                timeout = max(0, min(retry_at for retry_at, _ in retries) - now) if retries else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        job.attempts += 1
+                        job.error = e
+                        if job.attempts > self.max_retries:
+                            print(f"{job} failed after {job.attempts} attempts: {e}")
+                            job.stage = "failed"
+                        else:
+                            # Back off exponentially, the other jobs keep going meanwhile
+                            delay = self.retry_delay * 2 ** (job.attempts - 1)
+                            print(f"{job} failed ({e}), retrying in {delay:.1f} seconds (attempt {job.attempts + 1}/{self.max_retries + 1})")
+                            retries.append((time.time() + delay, job))
+                        continue
+
+                    job.attempts = 0
+                    job.error = None
+                    if job.stage == "download":
+                        if not result:
+                            print(f"{job} does not exist online, skipping")
+                            job.stage = "failed"
+                            job.error = Exception("Invalid dump parameters")
+                            continue
+                        job.stage = "extract"
+                    elif job.stage == "extract":
+                        job.stage = "parse"
+                    elif job.stage == "parse":
+                        job.result = result
+                        job.stage = "done"
+                        print(f"{job} parsed: {result[0]} nodes and {result[1]} edges")
+                        continue
+                    self.__submit(pools, running, job)
+
+        succeeded = sum(1 for job in self.jobs if job.stage == "done")
+        print(f"Batch finished in {time.time() - start_time:.2f} seconds: {succeeded}/{len(self.jobs)} dumps parsed")
+        return self.jobs
+
+    def __submit(self, pools: dict, running: dict, job: WikiBatchJob):
+        match job.stage:
+            case "download":
+                future = pools["download"].submit(self.__download, job)
+            case "extract":
+                future = pools["extract"].submit(self.__extract, job)
+            case "parse":
+                future = pools["parse"].submit(_parse_job, job.language, job.date, job.directory, job.output_path, self.format, self.compression)
+            case _:
+                raise Exception(f"Invalid stage {job.stage}")
+        running[future] = job
+
+    def __get_wikimap(self, job: WikiBatchJob) -> WikiMap:
+        if job.wm is None:
+            job.wm = WikiMap(date=job.date, language=job.language, directory=job.directory, connection_budget=self.connection_budget)
+        return job.wm
+
+    def __download(self, job: WikiBatchJob) -> bool:
+        wm = self.__get_wikimap(job)
+        if wm.is_downloaded() or wm.is_extracted():
+            return True
+        if not wm.exists():
+            return False
+        makedirs(job.directory, exist_ok=True)
+        wm.dd.download(path.join(job.directory, wm.dump_name + ".bz2"))
+        return True
+
+    def __extract(self, job: WikiBatchJob) -> bool:
+        wm = self.__get_wikimap(job)
+        if not wm.is_extracted():
+            wm.dd.extract(path.join(job.directory, wm.dump_name + ".bz2"))
+            # extract() only reports its errors, make them visible to the retry logic
+            if not wm.is_extracted():
+                raise Exception("Extraction failed")
+        return True
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+def csr_gather(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Concatenation of the given CSR rows without a Python loop
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    # Position of every gathered value: row start + offset inside the row
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets]
+
+
+def build_csr(rows: np.ndarray, values: np.ndarray, rows_count: int) -> tuple[np.ndarray, np.ndarray]:
+    # Rows sorted, duplicates removed
+    order = np.lexsort((values, rows))
+    rows, values = rows[order], values[order]
+    unique = np.r_[True, (rows[1:] != rows[:-1]) | (values[1:] != values[:-1])] if len(rows) else np.zeros(0, dtype=bool)
+    rows, values = rows[unique], values[unique]
+    indptr = np.zeros(rows_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=rows_count), out=indptr[1:])
+    return indptr, values
+
+
+class CategoryIndex:
+    def __init__(self, names: list[str], page_ids: np.ndarray, members_indptr: np.ndarray, members: np.ndarray, children_indptr: np.ndarray, children: np.ndarray):
+        self.names = names  # Category id -> lowercase name (without namespace prefix)
+        self.ids = {name: id for id, name in enumerate(names)}
+        self.page_ids = page_ids  # Category id -> page ID (-1 for categories used without a page)
+        self.members_indptr = members_indptr  # Category id -> range of article original ids in members
+        self.members = members
+        self.children_indptr = children_indptr  # Category id -> range of subcategory ids in children
+        self.children = children
+
+    @staticmethod
+    def build(names: list[str], page_ids: np.ndarray, subcategory_children: np.ndarray, subcategory_parents: np.ndarray,
+              membership_articles: np.ndarray, membership_categories: np.ndarray) -> "CategoryIndex":
+        # Pairs collected while parsing, as category ids (index in names) and article original ids
+        children_indptr, children = build_csr(subcategory_parents, subcategory_children, len(names))
+        members_indptr, members = build_csr(membership_categories, membership_articles, len(names))
+        return CategoryIndex(names, page_ids, members_indptr, members, children_indptr, children)
+
+    def __len__(self):
+        return len(self.names)
+
+    def subcategories(self, name: str, depth: int = 0) -> np.ndarray:
+        # Ids of the category and of its subcategories down to depth levels (breadth-first over the CSR)
+        name = name.replace("_", " ").strip().lower()
+        if name not in self.ids:
+            raise ValueError(f"Category {name} not found.")
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([self.ids[name]], dtype=np.int64)
+        visited[frontier] = True
+        for _ in range(depth):
+            frontier = np.unique(csr_gather(self.children_indptr, self.children, frontier))
+            frontier = frontier[~visited[frontier]]
+            if len(frontier) == 0:
+                break
+            visited[frontier] = True
+        return np.flatnonzero(visited)
+
+    def articles(self, name: str, depth: int = 0) -> np.ndarray:
+        # Sorted original ids of the articles in the category tree
+        return np.unique(csr_gather(self.members_indptr, self.members, self.subcategories(name, depth)))
+
+    def save(self, output_path: str):
+        np.savez_compressed(output_path + ".categories.npz", names=np.array(self.names, dtype=str), page_ids=self.page_ids, members_indptr=self.members_indptr,
+                            members=self.members, children_indptr=self.children_indptr, children=self.children)
+
+    @staticmethod
+    def load(input_path: str) -> "CategoryIndex":
+        data = np.load(input_path + ".categories.npz")
+        return CategoryIndex(data["names"].tolist(), data["page_ids"], data["members_indptr"], data["members"], data["children_indptr"], data["children"])
@@ -0,0 +1,6 @@
+# graph partition strategies enum
+from enum import Enum
+
+class WikiPartitionStrategy(Enum):
+    HASH = 'hash'
+    COMMUNITY = 'community'
\ No newline at end of file
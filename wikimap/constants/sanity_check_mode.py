@@ -4,4 +4,6 @@ from enum import Enum
 class WikiSanityCheckMode(Enum):
     NODES_SELECTION = 'nodes'
     EDGES_SELECTION = 'edges'
-    NODES_EDGES_SELECTION = 'nodes_edges'
\ No newline at end of file
+    NODES_EDGES_SELECTION = 'nodes_edges'
+    # Every article, compared with the pagelinks SQL dump instead of the API
+    OFFLINE = 'offline'
\ No newline at end of file
@@ -1,16 +1,20 @@
 import os
+import shutil
 import requests
 from concurrent.futures import ThreadPoolExecutor
 from bz2 import BZ2File
 import time
+from contextlib import nullcontext
 from os import path
 from tqdm import tqdm
 
 
 class DumpDownloader:
-    def __init__(self, url, num_threads=-1):
+    def __init__(self, url, num_threads=-1, connection_budget=None):
         self.url = url
         self.num_threads = num_threads
+        # Optional semaphore shared between downloaders to cap the connections opened on the host
+        self.connection_budget = connection_budget
         # automatically set the number of threads based on the number of cores available
         if self.num_threads == -1:
             self.num_threads = os.cpu_count()
@@ -53,30 +57,32 @@ class DumpDownloader:
             
             for attempt in range(max_retries):
                 try:
-                    response = requests.get(self.url, headers=headers, stream=True, timeout=10)
-                    
-                    # Check if the server responded with a retryable status code
-                    if response.status_code == 503:
-                        retry_after = response.headers.get("Retry-After")
-                        retry_delay = int(retry_after) if retry_after else retry_delay
-                        print(f"Thread {thread_index + 1} received 503. Retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-                        continue
-                    
-                    response.raise_for_status()
-                    
-                    # Write the content to a temporary file
-                    with open(temp_file, 'wb') as f, tqdm(
-                        total=(end - start + 1) // 1024,
-                        unit='KB',
-                        desc=f"Thread {thread_index + 1}",
-                        position=thread_index
-                    ) as pbar:
-                        for chunk in response.iter_content(1024):
-                            if chunk:
-                                f.write(chunk)
-                                pbar.update(len(chunk) // 1024)
-                    return  # Exit after successful download
+                    # The connection slot is only held while the request is open, never while waiting to retry
+                    with self.connection_budget if self.connection_budget is not None else nullcontext():
+                        response = requests.get(self.url, headers=headers, stream=True, timeout=10)
+
+                        if response.status_code != 503:
+                            response.raise_for_status()
+
+                            # Write the content to a temporary file
+                            with open(temp_file, 'wb') as f, tqdm(
+                                total=(end - start + 1) // 1024,
+                                unit='KB',
+                                desc=f"Thread {thread_index + 1}",
+                                position=thread_index
+                            ) as pbar:
+                                for chunk in response.iter_content(1024):
+                                    if chunk:
+                                        f.write(chunk)
+                                        pbar.update(len(chunk) // 1024)
+                            return  # Exit after successful download
+                        response.close()
+
+                    # The server responded with a retryable status code
+                    retry_after = response.headers.get("Retry-After")
+                    retry_delay = int(retry_after) if retry_after else retry_delay
+                    print(f"Thread {thread_index + 1} received 503. Retrying in {retry_delay} seconds...")
+                    time.sleep(retry_delay)
                 
                 except requests.exceptions.RequestException as e:
                     print(f"Thread {thread_index + 1} encountered an error: {e}")
@@ -115,11 +121,10 @@ class DumpDownloader:
             return
 
         try:
-            # .bz2 file extraction
+            # .bz2 file extraction, streamed in 64 MB chunks instead of holding the whole dump in memory
             with BZ2File(output_path, 'rb') as file:
-                content = file.read()
                 with open(decompressed_path, 'wb') as decompressed_file:
-                    decompressed_file.write(content)
+                    shutil.copyfileobj(file, decompressed_file, 64 * 1024 * 1024)
             print(f"Extraction completed: {decompressed_path} in {time.time() - start_time:.2f} seconds")
         except OSError as e:
             print(f"Failed to extract {output_path}: {e}")
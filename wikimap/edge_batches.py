@@ -0,0 +1,42 @@
+import numpy as np
+from igraph import Graph
+
+
+def iter_edge_batches(graph: Graph, batch_size: int = 1000000):
+    # (sources, targets) vertex arrays of about batch_size edges each, in source order, without going through the
+    # full Python edge list. A vertex is never split between two batches, duplicate links and self-loops are kept
+    cumulative_degrees = np.cumsum(np.array(graph.outdegree(), dtype=np.int64))
+    bounds = np.r_[0, np.searchsorted(cumulative_degrees, np.arange(batch_size, graph.ecount(), batch_size), side="right"), graph.vcount()]
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if start == end:
+            continue
+        successors = [graph.successors(vertex) for vertex in range(start, end)]
+        lengths = np.fromiter(map(len, successors), dtype=np.int64, count=end - start)
+        targets = np.fromiter((target for vertex_targets in successors for target in vertex_targets), dtype=np.int64, count=int(lengths.sum()))
+        yield np.repeat(np.arange(start, end, dtype=np.int64), lengths), targets
+
+
+def edge_array(graph: Graph, batch_size: int = 1000000) -> np.ndarray:
+    # (m, 2) source, target array sorted by source, filled batch by batch (16 bytes per edge)
+    edges = np.empty((graph.ecount(), 2), dtype=np.int64)
+    count = 0
+    for sources, targets in iter_edge_batches(graph, batch_size):
+        edges[count:count + len(sources), 0] = sources
+        edges[count:count + len(sources), 1] = targets
+        count += len(sources)
+    return edges
+
+
+def edge_keys(graph: Graph, ids: np.ndarray, batch_size: int = 1000000) -> np.ndarray:
+    # Sorted unique (ids[source] << 32 | ids[target]) keys, one int64 per distinct edge. Page IDs fit in 32 bits,
+    # so a key sorts and compares as the pair. The links of a source are all in the same batch, so merging
+    # the duplicates batch by batch merges them all
+    keys = np.empty(graph.ecount(), dtype=np.int64)
+    count = 0
+    for sources, targets in iter_edge_batches(graph, batch_size):
+        batch_keys = np.unique((ids[sources] << 32) | ids[targets])
+        keys[count:count + len(batch_keys)] = batch_keys
+        count += len(batch_keys)
+    keys = keys[:count]
+    keys.sort()
+    return keys
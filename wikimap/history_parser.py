@@ -0,0 +1,250 @@
+import bz2
+from array import array
+from datetime import datetime
+from os import stat
+import time
+import re
+import numpy as np
+from lxml import etree
+from tqdm import tqdm
+
+from .timeline import WikiEdgeTimeline, ALIVE
+from .article_reader import title_hash
+
+
+class HistoryDumpParser:
+    def __init__(self, file_paths):
+        # Compressed .bz2 files of the history dump (one, or the parts of a split dump), streamed without extraction
+        self.file_paths = [file_paths] if isinstance(file_paths, str) else list(file_paths)
+        if not self.file_paths:
+            raise Exception("No history dump file to parse")
+        self.file_size = sum(stat(file_path).st_size for file_path in self.file_paths)
+
+        self.pages_count = 0
+        self.redirect_pages_count = 0
+        self.revisions_count = 0
+
+        self.link_pattern = r'\[\[([^\n\|\]\[\<\>\{\}]{1,256})(?:\|[^\[\]]*)?\]\]'  # Regex for internal links
+
+        self.titles_original_case = {}  # Dictionary lowercase title -> original title
+        self.aliases_counts = {}  # Dictionary Original title -> count of aliases
+        self.nodes = {}  # Dictionary node -> ID
+        self.reverse_nodes = {}  # ID -> node (for reverse lookup)
+        self.created = {}  # ID -> timestamp of the first revision
+        self.edges = []  # List of (source_id, target_id) for edges present in the last revisions
+
+        # Redirects as title hashes (see title_hash), resolved with the articles once the whole dump is read
+        self.alias_hashes = array('Q')
+        self.alias_target_hashes = array('Q')
+
+        # Lifetimes of the links of every article, built when its page ends. Link titles are kept as hashes,
+        # so no dictionary grows with the distinct titles (red links and typos included) of the whole history
+        self.lifetime_sources = array('q')  # Page ID
+        self.lifetime_targets = array('Q')  # Link title hash
+        self.lifetime_births = array('q')  # Timestamp of the revision adding the link (seconds since epoch)
+        self.lifetime_deaths = array('q')  # Timestamp of the revision removing it, ALIVE if still in the last one
+
+        self.timeline = None
+
+        self.__run()
+
+    def get_file_size(self):
+        return self.file_size
+
+    def get_pages_count(self):
+        return self.pages_count
+
+    def get_redirect_pages_count(self):
+        return self.redirect_pages_count
+
+    def get_revisions_count(self):
+        return self.revisions_count
+
+    def get_articles_count(self):
+        # Articles = Pages - Redirects (ns = 0)
+        return self.pages_count - self.redirect_pages_count
+
+    def get_titles_original_case(self):
+        return self.titles_original_case
+
+    def get_aliases_counts(self):
+        return self.aliases_counts
+
+    def get_nodes(self):
+        return self.nodes
+
+    def get_reverse_nodes(self):
+        return self.reverse_nodes
+
+    def get_created(self):
+        return self.created
+
+    def get_edges(self):
+        return self.edges
+
+    def get_timeline(self) -> WikiEdgeTimeline:
+        return self.timeline
+
+    def __run(self):
+        print(f"Starting to parse history {', '.join(self.file_paths)}")
+        start_time = time.time()
+
+        with tqdm(unit=" revisions") as pbar:
+            for file_path in self.file_paths:
+                with bz2.open(file_path, "rb") as f:
+                    self.__parse_xml(f, pbar)
+        self.__build_data()
+
+        print(f"Finished parsing in {time.time() - start_time:.2f} seconds")
+        print(f"Total pages: {self.pages_count} including {self.redirect_pages_count} redirects, {self.revisions_count} revisions")
+        print(f"Total articles: {self.get_articles_count()}, {len(self.timeline)} edge lifetimes")
+
+    def __parse_xml(self, file, pbar):
+        # Only one page (one revision text and the lifetimes of its links) is kept in memory at a time,
+        # the file is decompressed as it is read
+        page = {}
+        open_links = {}  # Links of the current revision -> timestamp of the revision adding them
+        lifetimes = []  # Closed lifetimes of the page: (link, birth, death)
+        context = etree.iterparse(file, events=("end",), huge_tree=True)
+        for _, elem in context:
+            tag = elem.tag.split('}')[-1]
+            parent = elem.getparent()
+            parent_tag = parent.tag.split('}')[-1] if parent is not None else None
+
+            if parent_tag == "page" and tag in ("title", "ns", "id"):
+                page[tag] = elem.text
+            elif parent_tag == "page" and tag == "redirect":
+                page["redirect"] = elem.attrib.get("title")
+            elif tag == "revision":
+                if page.get("ns") == "0" and page.get("id"):
+                    self._process_revision(int(page["id"]), elem, open_links, lifetimes)
+                    pbar.update(1)
+                elem.clear()
+                # Drop the revisions already processed
+                while elem.getprevious() is not None:
+                    del parent[0]
+            elif tag == "page":
+                self._process_page(page, open_links, lifetimes)
+                page = {}
+                open_links = {}
+                lifetimes = []
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+    def _process_revision(self, id, elem, open_links, lifetimes):
+        timestamp = None
+        text = None
+        deleted = True  # Revisions without a readable text (hidden by an administrator) do not change the links
+        for child in elem:
+            tag = child.tag.split('}')[-1]
+            if tag == "timestamp":
+                timestamp = int(datetime.fromisoformat(child.text.replace("Z", "+00:00")).timestamp())
+            elif tag == "text":
+                text = child.text
+                deleted = "deleted" in child.attrib
+        if timestamp is None:
+            return
+
+        self.revisions_count += 1
+        if id not in self.created:
+            self.created[id] = timestamp
+        if deleted:
+            return
+
+        links = {link.lower() for link in re.findall(self.link_pattern, text)} if text else set()
+        for link in [link for link in open_links if link not in links]:
+            lifetimes.append((link, open_links.pop(link), timestamp))
+        for link in links:
+            if link not in open_links:
+                open_links[link] = timestamp
+
+    def _process_page(self, page, open_links, lifetimes):
+        if page.get("ns") != "0" or not page.get("id") or not page.get("title"):
+            return
+
+        id = int(page["id"])
+        title = page["title"]
+        redirect = page.get("redirect")
+
+        self.pages_count += 1
+
+        # The last revision tells whether the page is an article or a redirect
+        if redirect:
+            title = title.lower()
+            redirect = redirect.lower()
+            self.redirect_pages_count += 1
+            self.alias_hashes.append(title_hash(title))
+            self.alias_target_hashes.append(title_hash(redirect))
+            self.aliases_counts[redirect] = self.aliases_counts.get(redirect, 0) + 1
+            self.created.pop(id, None)
+        else:
+            self.titles_original_case[title.lower()] = title
+            title = title.lower()
+            self.nodes[title] = id
+            self.reverse_nodes[id] = title
+            # Only the links of articles are kept
+            for link, birth, death in lifetimes + [(link, birth, ALIVE) for link, birth in open_links.items()]:
+                self.lifetime_sources.append(id)
+                self.lifetime_targets.append(title_hash(link))
+                self.lifetime_births.append(birth)
+                self.lifetime_deaths.append(death)
+
+    def __build_data(self):
+        # Link title hash -> article ID: redirects first (as of the last revision, last one wins), then the articles
+        node_hashes = np.array([title_hash(title) for title in self.nodes], dtype=np.uint64)
+        node_ids = np.array(list(self.nodes.values()), dtype=np.int64)
+        order = np.argsort(node_hashes, kind="stable")
+        node_hashes, node_ids = node_hashes[order], node_ids[order]
+        alias_hashes, last = np.unique(np.frombuffer(self.alias_hashes, dtype=np.uint64)[::-1], return_index=True)
+        alias_targets = self.__resolve(np.frombuffer(self.alias_target_hashes, dtype=np.uint64)[::-1][last], node_hashes, node_ids)
+        self.alias_hashes = array('Q')
+        self.alias_target_hashes = array('Q')
+
+        link_hashes = np.frombuffer(self.lifetime_targets, dtype=np.uint64)
+        targets = self.__resolve(link_hashes, node_hashes, node_ids)
+        aliases = self.__find(link_hashes, alias_hashes)
+        aliased = aliases >= 0
+        targets[aliased] = alias_targets[aliases[aliased]]
+        del link_hashes, aliases, aliased
+        self.lifetime_targets = array('Q')
+
+        sources = np.frombuffer(self.lifetime_sources, dtype=np.int64)
+        births = np.frombuffer(self.lifetime_births, dtype=np.int64)
+        deaths = np.frombuffer(self.lifetime_deaths, dtype=np.int64)
+
+        # Keep the links between articles, without self-loops. Several link titles can resolve to the same target
+        # (e.g. an article and its redirect), their lifetimes are merged as +1 / -1 events
+        valid = (targets >= 0) & (sources != targets)
+        sources, targets, births, deaths = sources[valid], targets[valid], births[valid], deaths[valid]
+        closed = deaths != ALIVE
+        self.timeline = WikiEdgeTimeline.from_events(
+            np.concatenate([sources, sources[closed]]),
+            np.concatenate([targets, targets[closed]]),
+            np.concatenate([births, deaths[closed]]),
+            np.concatenate([np.ones(len(births), dtype=np.int8), np.full(int(closed.sum()), -1, dtype=np.int8)]),
+        )
+
+        # Free memory
+        del sources, targets, births, deaths
+        self.lifetime_sources = array('q')
+        self.lifetime_births = array('q')
+        self.lifetime_deaths = array('q')
+
+        alive = self.timeline.deaths == ALIVE
+        self.edges = list(zip(self.timeline.sources[alive].tolist(), self.timeline.targets[alive].tolist()))
+
+    def __find(self, hashes: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        # Position of every hash in the sorted keys, -1 when it is not one of them
+        if len(keys) == 0:
+            return np.full(len(hashes), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(keys, hashes), len(keys) - 1)
+        return np.where(keys[positions] == hashes, positions, -1)
+
+    def __resolve(self, hashes: np.ndarray, keys: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        # Article ID of every hash, -1 when it is not an article
+        positions = self.__find(hashes, keys)
+        found = positions >= 0
+        resolved = np.full(len(hashes), -1, dtype=np.int64)
+        resolved[found] = ids[positions[found]]
+        return resolved
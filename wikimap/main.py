@@ -1,7 +1,8 @@
-import json
-from os import path, makedirs, remove
+from os import path, makedirs, remove, listdir
 from datetime import datetime
 import random
+import re
+import numpy as np
 import tarfile
 import time
 from constants.sanity_check_mode import WikiSanityCheckMode
@@ -16,13 +17,24 @@ from sanity import WikiSanityChecker
 
 from .constants.language import WikiLanguage
 from .constants.graph_format import WikiGraphFormat
+from .constants.partition_strategy import WikiPartitionStrategy
 from .dump_downloader import DumpDownloader
 from .parser import DumpParser
+from .history_parser import HistoryDumpParser
+from .timeline import WikiEdgeTimeline
+from .category_index import CategoryIndex
+from .snapshot_diff import WikiSnapshotDiff
+from .sharding import WikiGraphSharder
+from .article_reader import WikiArticleReader
+from .visualizer import WikiVisualizer
+from .server import WikiGraphServer
+from .analyzer import Analyzer
+from .offline_sanity import WikiOfflineSanityChecker
 
 
 class WikiMap:
 
-    def __init__(self, date: datetime | str = "latest", language: WikiLanguage = WikiLanguage.EN, with_history: bool = False, directory: str = None):
+    def __init__(self, date: datetime | str = "latest", language: WikiLanguage = WikiLanguage.EN, with_history: bool = False, directory: str = None, connection_budget=None, with_categories: bool = False):
         if date == "latest":
             self.string_date = "latest"
         elif isinstance(date, datetime):
@@ -34,17 +46,41 @@ class WikiMap:
         self.date = date
         self.language = language
         self.with_history = with_history
+        self.with_categories = with_categories
         self.directory = directory if directory else f"data/{self.string_language}/{self.string_date}"
-        self.dump_name = f"{self.string_language}wiki-{self.string_date}-pages-articles.xml"
+        # The history dump contains every revision of every page instead of the last one only. It is read compressed
+        # (never extracted), and large wikis split it in pages-meta-history{N}.xml-p{first}p{last}.bz2 files
+        self.dump_type = "pages-meta-history" if with_history else "pages-articles"
+        self.history_files = None  # File names of the history dump, listed from the dump directory online
+        self.dump_name = f"{self.string_language}wiki-{self.string_date}-{self.dump_type}.xml"
         self.url = f"https://dumps.wikimedia.org/{self.string_language}wiki/{self.string_date}/{self.dump_name}.bz2"
         # Cap to 3 threads beacause of dumps.wikimedia.org rate limiting
-        self.dd = DumpDownloader(self.url, num_threads=3)
+        # connection_budget is an optional semaphore shared by several WikiMap instances downloading at once
+        self.dd = DumpDownloader(self.url, num_threads=3, connection_budget=connection_budget)
+        self.visualizer = None
+        self.analyzer = None
+        self.timeline = None
+        self.category_index = None
+        self.article_reader = None
+        # Same articles split in independent bz2 streams, with an index of the stream of every page
+        self.multistream_name = f"{self.string_language}wiki-{self.string_date}-pages-articles-multistream"
 
     def load(self):
         # check if the dump exists online
         if not self.exists():
             raise Exception("Invalid dump parameters")
 
+        if self.with_history:
+            # Every part of the history dump is downloaded, none is extracted
+            makedirs(self.directory, exist_ok=True)
+            for file_name in self.__get_history_files():
+                file_path = path.join(self.directory, file_name)
+                if not (path.exists(file_path) and path.getsize(file_path) > 0):
+                    url = f"https://dumps.wikimedia.org/{self.string_language}wiki/{self.string_date}/{file_name}"
+                    DumpDownloader(url, num_threads=3, connection_budget=self.dd.connection_budget).download(file_path)
+            print("Dump loaded successfully")
+            return
+
         # check if the dump is already downloaded
         if not self.is_downloaded():
             # create directory if it does not exist recursively
@@ -58,9 +94,16 @@ class WikiMap:
 
         print("Dump loaded successfully")
 
-    def parse(self):
+    def parse(self, checkpoint_interval: int = None):
         # process the dump xml file
-        parser = DumpParser(path.join(self.directory, self.dump_name))
+        # with a checkpoint_interval (in pages), an interrupted parse resumes from the last checkpoint saved in the dump directory
+        if self.with_history:
+            parser = HistoryDumpParser(self.__local_history_files())
+            self.timeline = parser.get_timeline()  # edges lifetimes, see graph_as_of
+        else:
+            checkpoint_path = path.join(self.directory, "parse_checkpoint") if checkpoint_interval else None
+            parser = DumpParser(path.join(self.directory, self.dump_name), self.with_categories, checkpoint_path, checkpoint_interval)
+            self.category_index = parser.get_category_index()  # None unless with_categories
 
         # Get the original nodes and edges
         self.titles_original_case = parser.get_titles_original_case()  # {low_case_title: original_title}
@@ -84,6 +127,10 @@ class WikiMap:
         self.graph.vs["title"] = titles  # Add titles as a vertex attribute
         # Add original IDs as a vertex attribute
         self.graph.vs["original_id"] = original_ids
+        if self.with_history:
+            # Timestamp of the first revision of each article
+            created = parser.get_created()
+            self.graph.vs["created"] = [created[original_id] for original_id in original_ids]
 
         # Add edges
         self.graph.add_edges(remapped_edges)
@@ -93,6 +140,65 @@ class WikiMap:
     def get_graph(self):
         return self.graph
 
+    def graph_as_of(self, date: datetime) -> Graph:
+        # Graph of the articles and links existing at the given date, built from the edges timeline without re-parsing
+        if self.timeline is None:
+            raise Exception("No timeline available, parse a history dump (with_history=True) first")
+        original_ids = np.array(self.graph.vs["original_id"], dtype=np.int64)
+        if "created" in self.graph.vs.attributes():
+            existing = np.flatnonzero(np.array(self.graph.vs["created"], dtype=np.int64) <= WikiEdgeTimeline.to_timestamp(date))
+        else:
+            existing = np.arange(self.graph.vcount())
+        existing_ids = original_ids[existing]
+
+        # Vertices are sorted by original ID, so the edges are remapped with a binary search
+        # (links added before their target article was created are dropped)
+        edges = self.timeline.snapshot(date)
+        remapped_edges = np.minimum(np.searchsorted(existing_ids, edges), max(len(existing_ids) - 1, 0))
+        if len(existing_ids):
+            remapped_edges = remapped_edges[(existing_ids[remapped_edges] == edges).all(axis=1)]
+        else:
+            remapped_edges = remapped_edges[:0]
+
+        graph = Graph(directed=True)
+        graph.add_vertices(len(existing))
+        titles = self.graph.vs["title"]
+        graph.vs["title"] = [titles[i] for i in existing]
+        graph.vs["original_id"] = existing_ids.tolist()
+        graph.add_edges(remapped_edges.tolist())
+        print(f"Graph as of {date:%Y-%m-%d} contains {graph.vcount()} nodes and {graph.ecount()} edges.")
+        return graph
+
+    def category_subgraph(self, category: str, depth: int = 0) -> Graph:
+        # Articles of the category and of its subcategories down to depth levels, with the links between them
+        if self.category_index is None:
+            raise Exception("No category index available, parse the dump with with_categories=True first")
+        articles = self.category_index.articles(category, depth)
+
+        # Vertices are sorted by original ID, so articles are located with a binary search
+        original_ids = np.array(self.graph.vs["original_id"], dtype=np.int64)
+        indexes = np.minimum(np.searchsorted(original_ids, articles), max(len(original_ids) - 1, 0))
+        indexes = indexes[original_ids[indexes] == articles] if len(original_ids) else indexes[:0]
+        subgraph = self.graph.induced_subgraph(indexes.tolist())
+        print(f"Category {category} (depth {depth}) contains {subgraph.vcount()} articles and {subgraph.ecount()} links.")
+        return subgraph
+
+    def save_categories(self, output_path):
+        self.category_index.save(output_path)
+
+    def load_categories(self, input_path):
+        self.category_index = CategoryIndex.load(input_path)
+
+    def diff(self, other: "WikiMap") -> WikiSnapshotDiff:
+        # Changes from this snapshot to other (typically a later dump date), keyed by original ID
+        return WikiSnapshotDiff.compute(self.graph, other.graph)
+
+    def save_timeline(self, output_path):
+        self.timeline.save(output_path)
+
+    def load_timeline(self, input_path):
+        self.timeline = WikiEdgeTimeline.load(input_path)
+
     def save_graph(self, format: WikiGraphFormat, output_path, compression=False):
         start_time = time.time()
         print(f"Saving graph to {output_path} in {format} format{' with compression' if compression else ''}...")
@@ -140,10 +246,64 @@ class WikiMap:
         print(f"Graph saved successfully in {time.time() - start_time:.2f} seconds.")
               
 
+    def save_shards(self, output_path, num_shards: int, strategy: WikiPartitionStrategy = WikiPartitionStrategy.HASH) -> dict:
+        # One file per shard in output_path.shards/ (local CSR, id maps, ghost edges) and a manifest.json describing the partition
+        community_levels = self.communities() if strategy == WikiPartitionStrategy.COMMUNITY else None
+        return WikiGraphSharder(self.graph, num_shards, strategy, community_levels).save(output_path)
+
+    def load_graph(self, format: WikiGraphFormat, input_path, compression=False):
+        # Load a graph written by save_graph (same output_path and compression)
+        start_time = time.time()
+        print(f"Loading graph from {input_path} in {format} format{' with compression' if compression else ''}...")
+        match format:
+            case WikiGraphFormat.CSV:
+                if compression:
+                    with tarfile.open(input_path + ".graph.tgz", "r:gz") as tar:
+                        members = {member.name.split(".")[-2]: member for member in tar.getmembers()}
+                        nodes_lines = tar.extractfile(members["nodes"]).read().decode("utf-8").splitlines()
+                        edges_lines = tar.extractfile(members["edges"]).read().decode("utf-8").splitlines()
+                else:
+                    with open(input_path + ".nodes.csv", "r", encoding="utf-8") as f:
+                        nodes_lines = f.read().splitlines()
+                    with open(input_path + ".edges.csv", "r", encoding="utf-8") as f:
+                        edges_lines = f.read().splitlines()
+                # Skip the headers, nodes are written in id order
+                nodes = [line.split("\t") for line in nodes_lines[1:]]
+                self.graph = Graph(directed=True)
+                self.graph.add_vertices(len(nodes))
+                self.graph.vs["original_id"] = [int(node[1]) for node in nodes]
+                self.graph.vs["title"] = [node[2] for node in nodes]
+                self.graph.add_edges([tuple(map(int, line.split("\t"))) for line in edges_lines[1:]])
+                self.aliases_counts = {node[2]: int(node[6]) for node in nodes if node[6] != "0"}
+            case WikiGraphFormat.GRAPHML:
+                if compression:
+                    self.graph = Graph.Read_GraphMLz(input_path + ".graphml.gz")
+                else:
+                    self.graph = Graph.Read_GraphML(input_path + ".graphml")
+                # GraphML stores numbers as floats
+                self.graph.vs["original_id"] = [int(original_id) for original_id in self.graph.vs["original_id"]]
+                self.aliases_counts = {}
+            case _:  # Pajek files do not keep the vertex attributes
+                raise Exception("Invalid format")
+        # Only lowercase titles are saved
+        self.titles_original_case = {title: title for title in self.graph.vs["title"]}
+        print(f"Graph loaded successfully in {time.time() - start_time:.2f} seconds: {self.graph.vcount()} nodes and {self.graph.ecount()} edges.")
+
+    def communities(self, recompute: bool = False):
+        # Hierarchical community membership (levels x vertices), cached in the dump directory
+        return self.__get_analyzer().communities(recompute)
+
+    def community_graph(self, level: int = -1) -> Graph:
+        return self.__get_analyzer().community_graph(level)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8080, workers: int = 4):
+        # Share the in-memory graph with other processes through a local HTTP/JSON API
+        WikiGraphServer(self.graph, host, port, workers).run()
+
     def save(self, node_title, format, output_path):
         if format == "png" or format == "png":
             subgraph = self.__get_subgraph(node_title, 1)
-            layout = subgraph.layout("fr")
+            layout = self.__get_visualizer().layout(subgraph).tolist()
             visual_style = {}
             visual_style["vertex_label"] = subgraph.vs["title"]
             visual_style["vertex_color"] = "lightblue"
@@ -163,8 +323,8 @@ class WikiMap:
         node_title = node_title.lower()
         subgraph = self.__get_subgraph(node_title, depth)
 
-        # Draw the subgraph
-        layout = subgraph.layout("fr")
+        # Draw the subgraph (layout cached by node set)
+        layout = self.__get_visualizer().layout(subgraph).tolist()
         visual_style = {}
         visual_style["vertex_label"] = subgraph.vs["title"]
         visual_style["vertex_color"] = ["red" if v["title"].lower() == node_title else "lightblue" for v in subgraph.vs]
@@ -178,101 +338,12 @@ class WikiMap:
         plot(subgraph, ax, **visual_style)
         plt.show()
 
-    def display_html(self, node_title: str, depth: int, output_path: str):
+    def display_html(self, node_title: str, depth: int, output_path: str, max_nodes: int = 500, chunk_size: int = 200):
+        # Layout computed here and cached, low-degree nodes collapsed into clusters above max_nodes,
+        # data written next to the page in chunks of chunk_size nodes loaded progressively
         node_title = node_title.lower()
         subgraph = self.__get_subgraph(node_title, depth)
-
-        nodes = [
-            {"data": {"id": str(v.index), "label": v["title"]}, "classes": "ego" if v["title"].lower() == node_title else ""}
-            for v in subgraph.vs
-        ]
-        edges = [
-            {"data": {"source": str(e.source), "target": str(e.target)}}
-            for e in subgraph.es
-        ]
-        elements = nodes + edges
-
-        # Define the layout and stylesheet for Cytoscape
-        stylesheet = [
-            {
-                'selector': 'node',
-                'style': {
-                    'label': 'data(label)',
-                    'background-color': 'lightblue',
-                    'color': 'black',
-                    'text-valign': 'center',
-                    'text-halign': 'center',
-                    'font-size': '12px'
-                }
-            },
-            {
-                'selector': 'node.ego',
-                'style': {
-                    'background-color': 'red'
-                }
-            },
-            {
-                'selector': 'edge',
-                'style': {
-                    'line-color': 'gray',
-                    'width': 2
-                }
-            }
-        ]
-
-        layout = {
-            'name': 'breadthfirst',
-            'directed': True,
-            'padding': 10
-        }
-
-        # HTML structure for the Cytoscape component
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Graph Visualization</title>
-            <script src="https://cdn.jsdelivr.net/npm/cytoscape@3.22.0/dist/cytoscape.min.js"></script>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 0;
-                    padding: 0;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    background-color: #f0f0f0;
-                }}
-                #cy {{
-                    width: 80%;
-                    height: 80%;
-                    border: 1px solid #ccc;
-                    border-radius: 8px;
-                    background-color: white;
-                }}
-            </style>
-        </head>
-        <body>
-            <div id="cy"></div>
-
-            <script>
-                var cy = cytoscape({{
-                    container: document.getElementById('cy'),
-                    elements: {json.dumps(elements)},
-                    layout: {json.dumps(layout)},
-                    style: {json.dumps(stylesheet)},
-                }});
-            </script>
-        </body>
-        </html>
-        """
-
-        # Save the HTML content to the specified output path
-        with open(output_path, 'w') as f:
-            f.write(html_content)
+        self.__get_visualizer().export_html(subgraph, output_path, node_title, max_nodes, chunk_size)
 
     def sanity_check(self, mode: WikiSanityCheckMode = WikiSanityCheckMode.NODES_SELECTION, n: float = 0.5):
         if n <= 0 or n > 1:
@@ -280,14 +351,56 @@ class WikiMap:
         # Check if the graph is directed
         if not self.graph.is_directed():
             raise Exception("The graph is not directed.")
-        sc = WikiSanityChecker(self.graph, self.string_language, mode, n, self.titles_original_case)
+        if mode.value == WikiSanityCheckMode.OFFLINE.value:
+            # Every article is compared with the SQL dumps of the same date, n is not used
+            self.load_sql_dumps()
+            sc = WikiOfflineSanityChecker(self.graph, *[self.__sql_dump_path(table) for table in ("page", "pagelinks", "redirect", "linktarget")])
+        else:
+            sc = WikiSanityChecker(self.graph, self.string_language, mode, n, self.titles_original_case)
         sc.check()
         sc.save_analysis("sanity_check")
 
+    def load_sql_dumps(self, tables: tuple = ("page", "pagelinks", "redirect", "linktarget")):
+        # Download the SQL dumps used by the offline sanity check (kept compressed, they are read as streams)
+        makedirs(self.directory, exist_ok=True)
+        for table in tables:
+            file_path = self.__sql_dump_path(table)
+            if path.exists(file_path) and path.getsize(file_path) > 0:
+                continue
+            url = f"https://dumps.wikimedia.org/{self.string_language}wiki/{self.string_date}/{path.basename(file_path)}"
+            if requests.head(url).status_code != 200:
+                # linktarget only exists in the dumps produced since 2024
+                if table == "linktarget":
+                    continue
+                raise Exception(f"Invalid dump parameters: {url} not found")
+            DumpDownloader(url, num_threads=3, connection_budget=self.dd.connection_budget).download(file_path)
+
+    def load_multistream(self):
+        # Download the multistream dump and its index, both kept compressed (no extraction needed)
+        makedirs(self.directory, exist_ok=True)
+        for file_name in (f"{self.multistream_name}.xml.bz2", f"{self.multistream_name}-index.txt.bz2"):
+            file_path = path.join(self.directory, file_name)
+            if path.exists(file_path) and path.getsize(file_path) > 0:
+                continue
+            url = f"https://dumps.wikimedia.org/{self.string_language}wiki/{self.string_date}/{file_name}"
+            if requests.head(url).status_code != 200:
+                raise Exception(f"Invalid dump parameters: {url} not found")
+            DumpDownloader(url, num_threads=3, connection_budget=self.dd.connection_budget).download(file_path)
+
+    def get_article_text(self, title: str) -> str | None:
+        # Raw wikitext of an article, only the bz2 stream containing it is decompressed
+        return self.__get_article_reader().get_text(title)
+
+    def get_articles_text(self, titles: list[str]) -> dict:
+        # {title: wikitext or None}, titles grouped by stream so each stream is decompressed once
+        return self.__get_article_reader().get_texts(titles)
+
     def exists(self):
         # check if the dump exists online
         # https://dumps.wikimedia.org/elwiki/latest/elwiki-latest-pages-articles.xml.bz2
         # doing head request on the URL "https://dumps.wikimedia.org/"" + language + "wiki/"" + date + "/" + language + "wiki-" + date + "-pages-articles.xml.bz2"
+        if self.with_history:
+            return len(self.__get_history_files()) > 0
         response = requests.head(self.url)
         # if the status code is 200, then the dump exists
         return response.status_code == 200
@@ -295,15 +408,61 @@ class WikiMap:
     def is_downloaded(self):
         # check if the dump is already downloaded
         # check if the file exists in the directory
+        if self.with_history:
+            files = [path.join(self.directory, file_name) for file_name in self.__get_history_files()]
+            return len(files) > 0 and all(path.exists(file_path) and path.getsize(file_path) > 0 for file_path in files)
         file_path = path.join(self.directory, self.dump_name + ".bz2")
         return path.exists(file_path) and path.getsize(file_path) > 0
 
     def is_extracted(self):
         # check if the dump is already extracted
         # check if the file exists in the directory
+        if self.with_history:
+            # The history dump is parsed compressed
+            return len(self.__local_history_files()) > 0
         file_path = path.join(self.directory, self.dump_name)
         return path.exists(file_path) and path.getsize(file_path) > 0
 
+    def __history_file_key(self, file_name: str):
+        # (part number, first page ID) of a history dump file, None if the name is not one
+        match = re.fullmatch(rf"{self.string_language}wiki-{self.string_date}-pages-meta-history(\d*)\.xml(?:-p(\d+)p\d+)?\.bz2", file_name)
+        if match is None:
+            return None
+        return int(match.group(1) or 0), int(match.group(2) or 0)
+
+    def __get_history_files(self) -> list[str]:
+        # Single file for small wikis, split files in page order for the large ones
+        if self.history_files is None:
+            response = requests.get(f"https://dumps.wikimedia.org/{self.string_language}wiki/{self.string_date}/")
+            names = set(re.findall(r'href="(?:[^"]*/)?([^"/]+\.bz2)"', response.text)) if response.status_code == 200 else set()
+            self.history_files = sorted((name for name in names if self.__history_file_key(name)), key=self.__history_file_key)
+        return self.history_files
+
+    def __local_history_files(self) -> list[str]:
+        names = listdir(self.directory) if path.isdir(self.directory) else []
+        names = sorted((name for name in names if self.__history_file_key(name)), key=self.__history_file_key)
+        return [path.join(self.directory, name) for name in names]
+
+    def __get_article_reader(self) -> WikiArticleReader:
+        if self.article_reader is None:
+            self.load_multistream()
+            self.article_reader = WikiArticleReader(path.join(self.directory, f"{self.multistream_name}.xml.bz2"),
+                                                    path.join(self.directory, f"{self.multistream_name}-index.txt.bz2"))
+        return self.article_reader
+
+    def __sql_dump_path(self, table: str) -> str:
+        return path.join(self.directory, f"{self.string_language}wiki-{self.string_date}-{table}.sql.gz")
+
+    def __get_analyzer(self) -> Analyzer:
+        if self.analyzer is None or self.analyzer.graph is not self.graph:
+            self.analyzer = Analyzer(self.graph, self.directory)
+        return self.analyzer
+
+    def __get_visualizer(self) -> WikiVisualizer:
+        if self.visualizer is None or self.visualizer.graph is not self.graph:
+            self.visualizer = WikiVisualizer(self.graph)
+        return self.visualizer
+
     def __get_subgraph(self, node_title: str, depth: int = 1, mode: str = "all") -> Graph:
         node_title = node_title.lower()
         node = self.graph.vs.find(title=node_title)
@@ -0,0 +1,212 @@
+import re
+import gzip
+import time
+from os import path
+from matplotlib import pyplot as plt
+import numpy as np
+from igraph import Graph
+
+from .edge_batches import edge_keys
+
+# Column types of the SQL dumps read as strings, every other column is read as a number
+SQL_STRING_TYPES = ("char", "binary", "blob", "text", "enum")
+SQL_STRING_VALUE = r"('(?:[^'\\]|\\.)*'|NULL)"
+SQL_NUMBER_VALUE = r"(-?[0-9.eE+-]+|NULL)"
+
+
+def sql_unescape(value: str) -> str:
+    # MySQL string literal -> lowercase title as stored in the graph
+    value = re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}.get(m.group(1), m.group(1)), value[1:-1])
+    return value.replace("_", " ").lower()
+
+
+def iter_sql_rows(file_path: str, columns: list[str], chunk_size: int = 1000000):
+    # Stream a mysqldump file (.sql.gz) and yield chunks of rows with only the requested columns
+    table_columns = []  # [(name, is_string)]
+    pattern = None
+    chunk = []
+    with gzip.open(file_path, "rt", encoding="utf-8", errors="replace") as f:
+        in_create = False
+        for line in f:
+            if line.startswith("CREATE TABLE"):
+                in_create = True
+            elif in_create:
+                match = re.match(r"\s*`(\w+)`\s+(\w+)", line)
+                if match:
+                    table_columns.append((match.group(1), match.group(2).lower().endswith(SQL_STRING_TYPES)))
+                elif line.startswith(")"):
+                    in_create = False
+                    missing = [column for column in columns if column not in dict(table_columns)]
+                    if missing:
+                        raise Exception(f"Columns {missing} not found in {file_path}")
+                    pattern = re.compile(r"\(" + ",".join(SQL_STRING_VALUE if is_string else SQL_NUMBER_VALUE for _, is_string in table_columns) + r"\)")
+                    names = [name for name, _ in table_columns]
+                    selected = [names.index(column) for column in columns]
+            elif line.startswith("INSERT INTO") and pattern is not None:
+                for match in pattern.finditer(line, line.index(" VALUES ")):
+                    values = match.groups()
+                    chunk.append(tuple(values[i] for i in selected))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+class WikiOfflineSanityChecker:
+    def __init__(self, graph: Graph, page_path: str, pagelinks_path: str, redirect_path: str, linktarget_path: str = None, chunk_size: int = 1000000):
+        self.graph = graph
+        self.page_path = page_path
+        self.pagelinks_path = pagelinks_path
+        self.redirect_path = redirect_path
+        # Since 2024 pagelinks references linktarget instead of storing the target title
+        self.linktarget_path = linktarget_path if linktarget_path and path.exists(linktarget_path) else None
+        self.chunk_size = chunk_size
+
+        # Articles of the graph, sorted by original ID as the vertices
+        self.article_ids = np.array(graph.vs["original_id"], dtype=np.int64)
+        self.graph_counts = None
+        self.dump_counts = None
+        self.common_counts = None
+
+    def check(self):
+        start_time = time.time()
+        titles = self.__load_titles()
+        print(f"Page table loaded in {time.time() - start_time:.2f} seconds: {len(titles)} titles")
+
+        start_time = time.time()
+        self.redirect_from, self.redirect_to = self.__load_redirects(titles)
+        print(f"Redirect table loaded in {time.time() - start_time:.2f} seconds: {len(self.redirect_from)} redirects")
+
+        start_time = time.time()
+        dump_keys = self.__load_links(titles)
+        titles.clear()
+        print(f"Pagelinks table loaded in {time.time() - start_time:.2f} seconds: {len(dump_keys)} links between articles")
+
+        # Same encoding on the graph side: (source original ID, target original ID) -> int64
+        graph_keys = edge_keys(self.graph, self.article_ids)
+
+        common_keys = np.intersect1d(graph_keys, dump_keys, assume_unique=True)
+        self.graph_counts = self.__count_by_source(graph_keys)
+        self.dump_counts = self.__count_by_source(dump_keys)
+        self.common_counts = self.__count_by_source(common_keys)
+
+        precision = len(common_keys) / len(graph_keys) if len(graph_keys) else 1.0
+        recall = len(common_keys) / len(dump_keys) if len(dump_keys) else 1.0
+        print(f"Links in graph: {len(graph_keys)}, in pagelinks: {len(dump_keys)}, common: {len(common_keys)}")
+        print(f"Precision: {precision:.4f}, Recall: {recall:.4f}")
+
+    def get_precision(self) -> np.ndarray:
+        # Per article: share of the graph links that are real links (1 when the graph has none)
+        return np.divide(self.common_counts, self.graph_counts, out=np.ones(len(self.article_ids)), where=self.graph_counts > 0)
+
+    def get_recall(self) -> np.ndarray:
+        # Per article: share of the real links found in the graph (1 when the article has none)
+        return np.divide(self.common_counts, self.dump_counts, out=np.ones(len(self.article_ids)), where=self.dump_counts > 0)
+
+    def save_analysis(self, path):
+        if self.common_counts is None:
+            raise Exception("Analysis not done yet")
+        precision = self.get_precision()
+        recall = self.get_recall()
+        titles = self.graph.vs["title"]
+        with open(path + ".csv", "w", encoding="utf-8") as f:
+            f.write("Node\tTitle\tGraph\tDump\tCommon\tPrecision\tRecall\n")
+            for i in range(len(self.article_ids)):
+                f.write(f"{i}\t{titles[i]}\t{self.graph_counts[i]}\t{self.dump_counts[i]}\t{self.common_counts[i]}\t{precision[i]:.4f}\t{recall[i]:.4f}\n")
+
+        # create and save a plot comparing the two counts with two curves (x = node, y = links count)
+        order = np.argsort(self.graph_counts, kind="stable")
+        plt.figure(figsize=(10, 6))
+        plt.plot(self.dump_counts[order], label="According to pagelinks dump", linestyle="-", color="r")
+        plt.plot(self.graph_counts[order], label="According to WikiMap Graph", linestyle="--", color="b")
+        plt.plot(self.common_counts[order], label="Common links", linestyle=":", color="g")
+        plt.xlabel("Articles")
+        plt.ylabel("Links count")
+        plt.title(f"Data sanity check: Comparison of links between WikiMap graph and pagelinks dump (outgoing degree)\n"
+                  f"Mean precision {precision.mean():.4f}, mean recall {recall.mean():.4f}")
+        plt.legend()
+        plt.grid()
+        plt.tight_layout()
+        plt.savefig(path + ".png")
+        plt.close()
+
+    def __keys(self, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        return (sources << 32) | targets
+
+    def __count_by_source(self, keys: np.ndarray) -> np.ndarray:
+        return np.bincount(np.searchsorted(self.article_ids, keys >> 32), minlength=len(self.article_ids))
+
+    def __load_titles(self) -> dict:
+        # Lowercase title -> page ID, for the main namespace (articles and redirects)
+        titles = {}
+        for chunk in iter_sql_rows(self.page_path, ["page_id", "page_namespace", "page_title"], self.chunk_size):
+            for page_id, namespace, title in chunk:
+                if namespace == "0":
+                    titles[sql_unescape(title)] = int(page_id)
+        return titles
+
+    def __load_redirects(self, titles: dict) -> tuple[np.ndarray, np.ndarray]:
+        # Sorted redirect page IDs and the page ID they point to
+        sources, targets = [], []
+        for chunk in iter_sql_rows(self.redirect_path, ["rd_from", "rd_namespace", "rd_title"], self.chunk_size):
+            for source, namespace, title in chunk:
+                target = titles.get(sql_unescape(title)) if namespace == "0" else None
+                if target is not None:
+                    sources.append(int(source))
+                    targets.append(target)
+        sources = np.array(sources, dtype=np.int64)
+        targets = np.array(targets, dtype=np.int64)
+        order = np.argsort(sources, kind="stable")
+        return sources[order], targets[order]
+
+    def __resolve(self, targets: np.ndarray) -> np.ndarray:
+        # Replace the redirects by the page they point to (one level, as the parser)
+        if len(self.redirect_from) == 0:
+            return targets
+        positions = np.minimum(np.searchsorted(self.redirect_from, targets), len(self.redirect_from) - 1)
+        redirected = self.redirect_from[positions] == targets
+        return np.where(redirected, self.redirect_to[positions], targets)
+
+    def __load_link_targets(self, titles: dict) -> tuple[np.ndarray, np.ndarray]:
+        # Sorted linktarget IDs of the main namespace and the page ID they name
+        ids, pages = [], []
+        for chunk in iter_sql_rows(self.linktarget_path, ["lt_id", "lt_namespace", "lt_title"], self.chunk_size):
+            for lt_id, namespace, title in chunk:
+                page = titles.get(sql_unescape(title)) if namespace == "0" else None
+                if page is not None:
+                    ids.append(int(lt_id))
+                    pages.append(page)
+        ids = np.array(ids, dtype=np.int64)
+        pages = np.array(pages, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        return ids[order], pages[order]
+
+    def __load_links(self, titles: dict) -> np.ndarray:
+        # Sorted unique keys of the links between articles of the graph, built chunk by chunk
+        if self.linktarget_path:
+            link_target_ids, link_target_pages = self.__load_link_targets(titles)
+            columns = ["pl_from", "pl_from_namespace", "pl_target_id"]
+        else:
+            columns = ["pl_from", "pl_from_namespace", "pl_namespace", "pl_title"]
+
+        keys = []
+        for chunk in iter_sql_rows(self.pagelinks_path, columns, self.chunk_size):
+            if self.linktarget_path:
+                rows = np.array(chunk, dtype=np.int64).reshape(-1, 3)
+                rows = rows[rows[:, 1] == 0]
+                positions = np.minimum(np.searchsorted(link_target_ids, rows[:, 2]), max(len(link_target_ids) - 1, 0))
+                found = link_target_ids[positions] == rows[:, 2] if len(link_target_ids) else np.zeros(len(rows), dtype=bool)
+                sources = rows[found, 0]
+                targets = link_target_pages[positions[found]]
+            else:
+                pairs = [(int(source), titles.get(sql_unescape(title), -1)) for source, from_namespace, namespace, title in chunk if from_namespace == "0" and namespace == "0"]
+                pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+                pairs = pairs[pairs[:, 1] >= 0]
+                sources, targets = pairs[:, 0], pairs[:, 1]
+
+            targets = self.__resolve(targets)
+            # Only links from and to articles of the graph, without self-loops
+            valid = np.isin(sources, self.article_ids) & np.isin(targets, self.article_ids) & (sources != targets)
+            keys.append(np.unique(self.__keys(sources[valid], targets[valid])))
+        return np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
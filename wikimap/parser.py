@@ -1,14 +1,47 @@
 import mmap
-from os import stat
+import json
+import pickle
+import shutil
+from array import array
+from itertools import islice
+from os import stat, path, makedirs, replace
 import time
 import re
+import numpy as np
 from lxml import etree
 from tqdm import tqdm
 
+from .category_index import CategoryIndex
+
+
+class JournaledDict(dict):
+    # dict remembering the keys written since the last checkpoint, overwrites included (in first write order)
+    def __init__(self):
+        super().__init__()
+        self.written = {}
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.written[key] = None
+
+    def clear(self):
+        super().clear()
+        self.written = {}
+
+    def pop_written(self):
+        # [(key, current value)] of the keys written since the previous call
+        items = [(key, self[key]) for key in self.written]
+        self.written = {}
+        return items
+
 
 class DumpParser:
-    def __init__(self, file_path):
+    def __init__(self, file_path, with_categories=False, checkpoint_path=None, checkpoint_interval=100000):
         self.file_path = file_path
+        self.with_categories = with_categories
+        # Directory where the state is saved every checkpoint_interval pages, a new parser resumes from it
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
         self.file_size = stat(file_path).st_size
         self.total_lines = self.__count_lines()
 
@@ -17,15 +50,32 @@ class DumpParser:
 
         self.link_pattern = r'\[\[([^\n\|\]\[\<\>\{\}]{1,256})(?:\|[^\[\]]*)?\]\]'  # Regex for internal links
 
-        self.raw_temp_data = {}  # Temporary storage for all pages
+        # With checkpoints, the dictionaries the pages write to (and overwrite) keep track of their writes
+        journaled = JournaledDict if checkpoint_path else dict
+
+        self.raw_temp_data = journaled()  # Temporary storage for all pages
 
-        self.titles_original_case = {}  # Dictionary lowercase title -> original title
-        self.aliases = {}  # Dictionary alias -> original title
-        self.aliases_counts = {}  # Dictionary Original title -> count of aliases
+        self.titles_original_case = journaled()  # Dictionary lowercase title -> original title
+        self.aliases = journaled()  # Dictionary alias -> original title
+        self.aliases_counts = journaled()  # Dictionary Original title -> count of aliases
         self.nodes = {}  # Dictionary node -> ID
         self.reverse_nodes = {}  # ID -> node (for reverse lookup)
         self.edges = []  # List of (source_id, target_id) for edges
 
+        # Category pages (ns = 14) and [[Category:...]] links, collected only with_categories
+        self.category_namespace = "category"  # Localized name read from the siteinfo
+        self.category_pattern = self.__compile_category_pattern()
+        self.category_keys = {}  # Dictionary lowercase category name -> key
+        self.category_pages = journaled()  # Dictionary category key -> page ID
+        self.subcategory_children = array('q')  # Category key
+        self.subcategory_parents = array('q')  # Category key
+        self.membership_articles = array('q')  # Article ID
+        self.membership_categories = array('q')  # Category key
+        self.category_index = None
+
+        self.checkpoint_segments = 0  # Number of state segments saved
+        self.checkpoint_lengths = self.__state_lengths()  # Size of the append-only collections at the last checkpoint
+
         self.__run()
 
     def get_file_size(self):
@@ -59,12 +109,23 @@ class DumpParser:
     def get_edges(self):
         return self.edges
 
+    def get_category_index(self) -> CategoryIndex:
+        return self.category_index
+
     def __run(self):
         print(f"Starting to parse {self.file_path}")
         start_time = time.time()
 
-        self.__parse_xml()
+        if self.checkpoint_path:
+            self.__parse_xml_resumable()
+        else:
+            self.__parse_xml()
         self.__build_data()
+        if self.with_categories:
+            self.__build_categories()
+        if self.checkpoint_path:
+            # The parse is complete, the next run starts over
+            shutil.rmtree(self.checkpoint_path, ignore_errors=True)
 
         # Free memory
         self.raw_temp_data.clear()
@@ -87,9 +148,128 @@ class DumpParser:
         for event, elem in tqdm(context, total=self.total_lines, unit=" lines"):
             if event == "start" and elem.tag.split('}')[-1] == "page":
                 self._process_page(elem)
+            elif elem.tag.split('}')[-1] == "namespace":
+                self._process_namespace(elem)
             # Free memory
             elem.clear()
 
+    def __parse_xml_resumable(self):
+        # Pages are cut on their <page> and </page> lines (one per line in the dumps) and parsed one by one,
+        # so the byte offset of the next page is known at every checkpoint
+        offset, lines = self.__load_checkpoint()
+        pages_since_checkpoint = 0
+        page_lines = None
+        with open(self.file_path, 'rb') as f, tqdm(total=self.total_lines, initial=lines, unit=" lines") as pbar:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                lines += 1
+                stripped = line.strip()
+                if page_lines is None:
+                    if stripped.startswith(b"<page>"):
+                        page_lines = [line]
+                    elif stripped.startswith(b"<namespace "):
+                        self._process_namespace(etree.fromstring(stripped))
+                else:
+                    page_lines.append(line)
+                if page_lines is not None and stripped.endswith(b"</page>"):
+                    self._process_page(etree.fromstring(b"".join(page_lines)))
+                    page_lines = None
+                    pages_since_checkpoint += 1
+                    if pages_since_checkpoint >= self.checkpoint_interval:
+                        self.__save_checkpoint(offset, lines)
+                        pages_since_checkpoint = 0
+                    pbar.update(lines - pbar.n)
+            pbar.update(lines - pbar.n)
+
+    def __state_lengths(self):
+        return {
+            "category_keys": len(self.category_keys),
+            "subcategories": len(self.subcategory_children),
+            "memberships": len(self.membership_articles),
+        }
+
+    def __save_checkpoint(self, offset, lines):
+        # Only what was written since the previous checkpoint is saved (one segment per checkpoint): the keys written
+        # to the dictionaries with their current value (a title may overwrite another differing only by case),
+        # and the tail of the append-only collections. The manifest is replaced last so an interrupted save is ignored
+        makedirs(self.checkpoint_path, exist_ok=True)
+        start = self.checkpoint_lengths
+        segment = {
+            "raw_temp_data": self.raw_temp_data.pop_written(),
+            "titles_original_case": self.titles_original_case.pop_written(),
+            "aliases": self.aliases.pop_written(),
+            "aliases_counts": self.aliases_counts.pop_written(),
+            "category_keys": list(islice(self.category_keys, start["category_keys"], None)),
+            "category_pages": self.category_pages.pop_written(),
+            "subcategory_children": self.subcategory_children[start["subcategories"]:],
+            "subcategory_parents": self.subcategory_parents[start["subcategories"]:],
+            "membership_articles": self.membership_articles[start["memberships"]:],
+            "membership_categories": self.membership_categories[start["memberships"]:],
+        }
+        with open(path.join(self.checkpoint_path, f"segment_{self.checkpoint_segments}.pkl"), 'wb') as f:
+            pickle.dump(segment, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        manifest = {
+            "file_size": self.file_size,
+            "with_categories": self.with_categories,
+            "offset": offset,
+            "lines": lines,
+            "segments": self.checkpoint_segments + 1,
+            "pages_count": self.pages_count,
+            "redirect_pages_count": self.redirect_pages_count,
+            "category_namespace": self.category_namespace,
+        }
+        manifest_path = path.join(self.checkpoint_path, "manifest.json")
+        with open(manifest_path + ".tmp", 'w', encoding="utf-8") as f:
+            json.dump(manifest, f)
+        replace(manifest_path + ".tmp", manifest_path)
+
+        self.checkpoint_segments += 1
+        self.checkpoint_lengths = self.__state_lengths()
+
+    def __load_checkpoint(self):
+        # Returns the byte offset and line number to resume from (0, 0 without a usable checkpoint)
+        manifest_path = path.join(self.checkpoint_path, "manifest.json")
+        if not path.exists(manifest_path):
+            return 0, 0
+        with open(manifest_path, 'r', encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["file_size"] != self.file_size or manifest["with_categories"] != self.with_categories:
+            print(f"Checkpoint {self.checkpoint_path} does not match {self.file_path}, starting over")
+            return 0, 0
+
+        for i in range(manifest["segments"]):
+            with open(path.join(self.checkpoint_path, f"segment_{i}.pkl"), 'rb') as f:
+                segment = pickle.load(f)
+            # dict.update does not go through the journal, the loaded state is already saved
+            self.raw_temp_data.update(segment["raw_temp_data"])
+            self.titles_original_case.update(segment["titles_original_case"])
+            self.aliases.update(segment["aliases"])
+            self.aliases_counts.update(segment["aliases_counts"])
+            for name in segment["category_keys"]:
+                self.category_keys[name] = len(self.category_keys)
+            self.category_pages.update(segment["category_pages"])
+            self.subcategory_children.extend(segment["subcategory_children"])
+            self.subcategory_parents.extend(segment["subcategory_parents"])
+            self.membership_articles.extend(segment["membership_articles"])
+            self.membership_categories.extend(segment["membership_categories"])
+
+        self.pages_count = manifest["pages_count"]
+        self.redirect_pages_count = manifest["redirect_pages_count"]
+        self.category_namespace = manifest["category_namespace"]
+        self.category_pattern = self.__compile_category_pattern()
+        self.checkpoint_segments = manifest["segments"]
+        self.checkpoint_lengths = self.__state_lengths()
+        print(f"Resuming from checkpoint: {self.pages_count} pages already parsed, byte offset {manifest['offset']}")
+        return manifest["offset"], manifest["lines"]
+
+    def _process_namespace(self, elem):
+        if self.with_categories and elem.get("key") == "14" and elem.text:
+            # Category namespace name in the language of the wiki (e.g. "Catégorie")
+            self.category_namespace = elem.text.lower()
+            self.category_pattern = self.__compile_category_pattern()
+
     def _process_page(self, elem):
         id = None
         ns = None
@@ -102,8 +282,8 @@ class DumpParser:
             tag = child.tag.split('}')[-1]
             if tag == "ns":
                 ns = child.text
-                # Namespace = 0 (article)
-                if ns != "0":
+                # Namespace = 0 (article), 14 (category)
+                if ns != "0" and not (self.with_categories and ns == "14"):
                     return
             elif tag == "id":
                 id = child.text
@@ -117,6 +297,10 @@ class DumpParser:
                     if rev_tag == "text":
                         text = rev_child.text
 
+        if ns == "14" and id and title:
+            self._process_category_page(int(id), title, text, redirect)
+            return
+
         if ns != "0" or not id or not title:
             return
 
@@ -139,6 +323,52 @@ class DumpParser:
             links = re.findall(self.link_pattern, text) if text else []
             links = [link.lower() for link in links]
             self.raw_temp_data[title] = (id, links)
+            if self.with_categories and text:
+                for category in self.__find_categories(text):
+                    self.membership_articles.append(id)
+                    self.membership_categories.append(category)
+
+    def _process_category_page(self, id, title, text, redirect):
+        if redirect:
+            return
+        # Title without the namespace prefix
+        category = self.__category_key(title.split(":", 1)[-1])
+        self.category_pages[category] = id
+        if text:
+            for parent in self.__find_categories(text):
+                if parent != category:
+                    self.subcategory_children.append(category)
+                    self.subcategory_parents.append(parent)
+
+    def __compile_category_pattern(self):
+        # English prefix is always accepted in addition to the localized one
+        prefixes = {"category", self.category_namespace}
+        return re.compile(r'\[\[\s*(?:' + "|".join(re.escape(prefix) for prefix in prefixes) + r')\s*:\s*([^\n\|\]\[]{1,256})(?:\|[^\[\]]*)?\]\]', re.IGNORECASE)
+
+    def __find_categories(self, text):
+        return {self.__category_key(name) for name in self.category_pattern.findall(text)}
+
+    def __category_key(self, name):
+        name = name.replace("_", " ").strip().lower()
+        key = self.category_keys.get(name)
+        if key is None:
+            key = self.category_keys[name] = len(self.category_keys)
+        return key
+
+    def __build_categories(self):
+        names = list(self.category_keys.keys())  # keys are given in insertion order
+        page_ids = np.full(len(names), -1, dtype=np.int64)
+        for key, id in self.category_pages.items():
+            page_ids[key] = id
+        self.category_index = CategoryIndex.build(
+            names,
+            page_ids,
+            np.frombuffer(self.subcategory_children, dtype=np.int64),
+            np.frombuffer(self.subcategory_parents, dtype=np.int64),
+            np.frombuffer(self.membership_articles, dtype=np.int64),
+            np.frombuffer(self.membership_categories, dtype=np.int64),
+        )
+        print(f"Total categories: {len(self.category_index)} ({len(self.category_pages)} category pages), {len(self.category_index.members)} memberships")
 
     def __build_data(self):
         # Add nodes and edges
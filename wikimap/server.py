@@ -0,0 +1,202 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urlsplit, parse_qsl
+import numpy as np
+from igraph import Graph
+
+
+class WikiQueryError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class WikiGraphServer:
+    def __init__(self, graph: Graph, host: str = "127.0.0.1", port: int = 8080, workers: int = 4, cache_size: int = 1024, max_results: int = 10000):
+        self.graph = graph
+        self.host = host
+        self.port = port
+        self.cache_size = cache_size
+        self.max_results = max_results  # Upper bound on the nodes returned by a single query
+
+        # Shared, read-only lookups computed once for every request
+        self.titles = graph.vs["title"]
+        self.title_index = {title: index for index, title in enumerate(self.titles)}
+        self.original_ids = np.array(graph.vs["original_id"], dtype=np.int64)
+        self.degrees = {mode: np.array(graph.degree(mode=mode), dtype=np.int64) for mode in ("out", "in", "all")}
+        self.pagerank = None
+        self.pagerank_lock = Lock()
+
+        # Heavy queries run in threads so the event loop keeps answering the light ones
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache = OrderedDict()  # (endpoint, params) -> encoded response
+        self.metrics = {}  # endpoint -> {count, errors, cache_hits, latencies}
+
+        # endpoint -> (handler, heavy)
+        self.endpoints = {
+            "/title": (self.__title, False),
+            "/neighbors": (self.__neighbors, False),
+            "/ego": (self.__ego, True),
+            "/degree/top": (self.__degree_top, False),
+            "/pagerank/top": (self.__pagerank_top, True),
+            "/path": (self.__path, True),
+        }
+
+    def run(self):
+        asyncio.run(self.serve_forever())
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self.__handle_connection, self.host, self.port)
+        print(f"Serving graph with {self.graph.vcount()} nodes and {self.graph.ecount()} edges on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def get_metrics(self) -> dict:
+        metrics = {}
+        for endpoint, m in self.metrics.items():
+            latencies = np.array(m["latencies"], dtype=np.float64) if m["latencies"] else np.zeros(1)
+            metrics[endpoint] = {
+                "count": m["count"],
+                "errors": m["errors"],
+                "cache_hits": m["cache_hits"],
+                "mean_ms": round(float(latencies.mean()), 3),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                "max_ms": round(float(latencies.max()), 3),
+            }
+        return metrics
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Skip the headers, only GET requests without body are served
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                status, body = 405, json.dumps({"error": "Only GET requests are supported"}).encode()
+            else:
+                status, body = await self.__dispatch(parts[1])
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __dispatch(self, target: str) -> tuple[int, bytes]:
+        start_time = time.perf_counter()
+        url = urlsplit(target)
+        endpoint = url.path.rstrip("/") or "/"
+        params = dict(parse_qsl(url.query))
+
+        if endpoint == "/metrics":
+            return 200, json.dumps(self.get_metrics()).encode()
+        if endpoint not in self.endpoints:
+            return 404, json.dumps({"error": f"Unknown endpoint {endpoint}"}).encode()
+
+        m = self.metrics.setdefault(endpoint, {"count": 0, "errors": 0, "cache_hits": 0, "latencies": deque(maxlen=1000)})
+        m["count"] += 1
+        key = (endpoint, tuple(sorted(params.items())))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            m["cache_hits"] += 1
+            status, body = 200, self.cache[key]
+        else:
+            handler, heavy = self.endpoints[endpoint]
+            try:
+                if heavy:
+                    result = await asyncio.get_running_loop().run_in_executor(self.executor, handler, params)
+                else:
+                    result = handler(params)
+                status, body = 200, json.dumps(result, ensure_ascii=False).encode("utf-8")
+                self.cache[key] = body
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            except WikiQueryError as e:
+                status, body = e.status, json.dumps({"error": str(e)}).encode()
+            except ValueError as e:
+                status, body = 400, json.dumps({"error": str(e)}).encode()
+            except Exception as e:
+                status, body = 500, json.dumps({"error": str(e)}).encode()
+            if status != 200:
+                m["errors"] += 1
+        m["latencies"].append((time.perf_counter() - start_time) * 1000)
+        return status, body
+
+    def __node(self, params: dict, name: str = "title") -> int:
+        if name not in params:
+            raise WikiQueryError(400, f"Missing parameter {name}")
+        index = self.title_index.get(params[name].lower())
+        if index is None:
+            raise WikiQueryError(404, f"Node with title {params[name]} not found.")
+        return index
+
+    def __mode(self, params: dict, default: str = "out") -> str:
+        mode = params.get("mode", default)
+        if mode not in ("out", "in", "all"):
+            raise WikiQueryError(400, f"Invalid mode {mode}")
+        return mode
+
+    def __describe(self, indexes) -> list[dict]:
+        return [{"id": int(i), "original_id": int(self.original_ids[i]), "title": self.titles[i]} for i in indexes]
+
+    def __title(self, params: dict) -> dict:
+        index = self.__node(params, "q")
+        return {**self.__describe([index])[0], **{f"{mode}_degree": int(degrees[index]) for mode, degrees in self.degrees.items()}}
+
+    def __neighbors(self, params: dict) -> dict:
+        index = self.__node(params)
+        neighbors = self.graph.neighbors(index, mode=self.__mode(params))
+        return {"node": self.__describe([index])[0], "count": len(neighbors), "neighbors": self.__describe(neighbors[:self.max_results])}
+
+    def __ego(self, params: dict) -> dict:
+        index = self.__node(params)
+        k = int(params.get("k", 1))
+        if k < 0:
+            raise ValueError("k should be positive")
+        nodes = self.graph.neighborhood(index, order=k, mode=self.__mode(params, "all"))
+        if len(nodes) > self.max_results:
+            raise WikiQueryError(413, f"Ego subgraph has {len(nodes)} nodes, more than the {self.max_results} allowed")
+        subgraph = self.graph.induced_subgraph(nodes)
+        local_ids = subgraph.vs["original_id"]
+        return {
+            "nodes": [{"original_id": original_id, "title": title} for original_id, title in zip(local_ids, subgraph.vs["title"])],
+            "edges": [(local_ids[source], local_ids[target]) for source, target in subgraph.get_edgelist()],
+        }
+
+    def __top(self, values: np.ndarray, k: int) -> list[dict]:
+        k = min(max(k, 0), len(values), self.max_results)
+        if k == 0:
+            return []
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top], kind="stable")]
+        return [{**node, "value": values[i].item()} for node, i in zip(self.__describe(top), top)]
+
+    def __degree_top(self, params: dict) -> list[dict]:
+        return self.__top(self.degrees[self.__mode(params)], int(params.get("k", 10)))
+
+    def __pagerank_top(self, params: dict) -> list[dict]:
+        # Computed once, on the first request that needs it
+        with self.pagerank_lock:
+            if self.pagerank is None:
+                self.pagerank = np.array(self.graph.pagerank(), dtype=np.float64)
+        return self.__top(self.pagerank, int(params.get("k", 10)))
+
+    def __path(self, params: dict) -> dict:
+        source = self.__node(params, "source")
+        target = self.__node(params, "target")
+        path = self.graph.get_shortest_paths(source, to=target, mode=self.__mode(params), output="vpath")[0]
+        return {"length": len(path) - 1 if path else None, "path": self.__describe(path)}
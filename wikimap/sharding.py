@@ -0,0 +1,153 @@
+import json
+import heapq
+import time
+from os import path, makedirs
+import numpy as np
+from igraph import Graph
+
+from .constants.partition_strategy import WikiPartitionStrategy
+from .edge_batches import edge_array
+
+
+class WikiGraphSharder:
+    def __init__(self, graph: Graph, num_shards: int, strategy: WikiPartitionStrategy = WikiPartitionStrategy.HASH, community_levels: np.ndarray = None, imbalance: float = 0.05):
+        if num_shards < 1:
+            raise ValueError("num_shards should be at least 1")
+        if strategy == WikiPartitionStrategy.COMMUNITY and community_levels is None:
+            raise ValueError("community_levels are required by the community partition")
+        self.graph = graph
+        self.num_shards = num_shards
+        self.strategy = strategy
+        self.community_levels = community_levels  # levels x vertices, coarsest level last (see Analyzer.communities)
+        # Allowed excess of vertices in a shard over a perfect balance, for the community partition (every shard
+        # ends up with at most ceil(vertices / num_shards * (1 + imbalance)) vertices)
+        self.imbalance = imbalance
+
+    def partition(self) -> np.ndarray:
+        # Shard of every vertex
+        match self.strategy:
+            case WikiPartitionStrategy.HASH:
+                return self.__hash_partition()
+            case WikiPartitionStrategy.COMMUNITY:
+                return self.__community_partition()
+            case _:
+                raise Exception("Invalid partition strategy")
+
+    def save(self, output_path: str) -> dict:
+        start_time = time.time()
+        directory = output_path + ".shards"
+        makedirs(directory, exist_ok=True)
+        print(f"Saving graph to {directory} in {self.num_shards} shards ({self.strategy.value} partition)...")
+
+        shards = self.partition()
+        original_ids = np.array(self.graph.vs["original_id"], dtype=np.int64)
+        edges = edge_array(self.graph)
+        source_shards = shards[edges[:, 0]]
+        target_shards = shards[edges[:, 1]]
+        cut = source_shards != target_shards
+
+        # Edges grouped by the shard of their source, and cut edges by the shard of their target
+        out_order = np.argsort(source_shards, kind="stable")
+        out_bounds = np.searchsorted(source_shards[out_order], np.arange(self.num_shards + 1))
+        cut_edges = np.flatnonzero(cut)
+        in_order = cut_edges[np.argsort(target_shards[cut_edges], kind="stable")]
+        in_bounds = np.searchsorted(target_shards[in_order], np.arange(self.num_shards + 1))
+
+        shard_manifests = []
+        for shard in range(self.num_shards):
+            # Local ids follow the global order, so global -> local is a binary search in global_ids
+            global_ids = np.flatnonzero(shards == shard)
+            out_edges = edges[out_order[out_bounds[shard]:out_bounds[shard + 1]]]
+            internal = target_shards[out_order[out_bounds[shard]:out_bounds[shard + 1]]] == shard
+
+            # Local CSR of the edges inside the shard
+            local_sources = np.searchsorted(global_ids, out_edges[internal, 0])
+            local_targets = np.searchsorted(global_ids, out_edges[internal, 1])
+            order = np.lexsort((local_targets, local_sources))
+            indptr = np.zeros(len(global_ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(local_sources, minlength=len(global_ids)), out=indptr[1:])
+
+            # Ghost edges: leaving the shard (local source -> global target) and entering it (global source -> local target)
+            ghost_out = out_edges[~internal]
+            ghost_in = edges[in_order[in_bounds[shard]:in_bounds[shard + 1]]]
+
+            file_name = f"shard_{shard}.npz"
+            np.savez(path.join(directory, file_name),
+                     global_ids=global_ids, original_ids=original_ids[global_ids],
+                     indptr=indptr, indices=local_targets[order].astype(np.int32),
+                     ghost_out_sources=np.searchsorted(global_ids, ghost_out[:, 0]).astype(np.int32), ghost_out_targets=ghost_out[:, 1],
+                     ghost_out_shards=shards[ghost_out[:, 1]].astype(np.int32),
+                     ghost_in_sources=ghost_in[:, 0], ghost_in_shards=shards[ghost_in[:, 0]].astype(np.int32),
+                     ghost_in_targets=np.searchsorted(global_ids, ghost_in[:, 1]).astype(np.int32))
+            shard_manifests.append({
+                "file": file_name,
+                "vertices": int(len(global_ids)),
+                "internal_edges": int(internal.sum()),
+                "ghost_out_edges": int(len(ghost_out)),
+                "ghost_in_edges": int(len(ghost_in)),
+                "ghost_vertices": int(len(np.union1d(ghost_out[:, 1], ghost_in[:, 0]))),
+            })
+
+        sizes = np.bincount(shards, minlength=self.num_shards)
+        manifest = {
+            "num_shards": self.num_shards,
+            "strategy": self.strategy.value,
+            "vertices": self.graph.vcount(),
+            "edges": self.graph.ecount(),
+            "directed": self.graph.is_directed(),
+            # Partition quality: share of the edges between shards and largest shard over the mean size
+            "cut_edges": int(cut.sum()),
+            "cut_ratio": float(cut.mean()) if len(cut) else 0.0,
+            "balance": float(sizes.max() / sizes.mean()) if self.graph.vcount() else 1.0,
+            "shards": shard_manifests,
+        }
+        with open(path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Graph saved successfully in {time.time() - start_time:.2f} seconds: cut ratio {manifest['cut_ratio']:.4f}, balance {manifest['balance']:.3f}")
+        return manifest
+
+    @staticmethod
+    def load_shard(output_path: str, shard: int) -> dict:
+        # Arrays of one shard, for a worker that only needs its part of the graph
+        with open(path.join(output_path + ".shards", "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with np.load(path.join(output_path + ".shards", manifest["shards"][shard]["file"])) as data:
+            return {name: data[name] for name in data.files}
+
+    def __hash_partition(self) -> np.ndarray:
+        # Multiplicative hash of the original ids, consecutive ids land on different shards
+        original_ids = np.array(self.graph.vs["original_id"], dtype=np.int64).astype(np.uint64)
+        hashed = (original_ids * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+        return (hashed % np.uint64(self.num_shards)).astype(np.int64)
+
+    def __community_partition(self) -> np.ndarray:
+        # Whole communities are packed into the least loaded shard, largest first. A community that does not fit in it
+        # (load over the capacity) is replaced by its sub-communities of the finer level, and by single vertices below
+        # the finest level. Single vertices always fit, so no shard goes over the capacity
+        n = self.graph.vcount()
+        capacity = max(1, int(np.ceil(n / self.num_shards * (1 + self.imbalance))))
+        levels = self.community_levels
+
+        shards = np.zeros(n, dtype=np.int64)
+        loads = [(0, shard) for shard in range(self.num_shards)]
+        # Units of vertices placed together: (-size, counter, level of the community, vertices), the whole graph first
+        units = [(-n, 0, len(levels), np.arange(n))]
+        counter = 1
+        while units:
+            _, _, level, vertices = heapq.heappop(units)
+            load, shard = loads[0]
+            if load + len(vertices) <= capacity:
+                shards[vertices] = shard
+                heapq.heapreplace(loads, (load + len(vertices), shard))
+                continue
+
+            if level == 0:
+                groups = np.split(vertices, len(vertices))
+            else:
+                membership = levels[level - 1][vertices]
+                order = np.argsort(membership, kind="stable")
+                groups = np.split(vertices[order], np.flatnonzero(np.diff(membership[order])) + 1)
+            for group in groups:
+                heapq.heappush(units, (-len(group), counter, level - 1, group))
+                counter += 1
+        return shards
@@ -0,0 +1,107 @@
+import time
+import numpy as np
+from igraph import Graph
+
+from .edge_batches import edge_keys
+
+
+def sorted_difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Values of the sorted array a missing from the sorted array b (binary search, no concatenation)
+    if len(b) == 0:
+        return a
+    positions = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[positions] != a]
+
+
+class WikiSnapshotDiff:
+    def __init__(self, added_articles: np.ndarray, removed_articles: np.ndarray, added_titles: list[str], removed_titles: list[str],
+                 added_edges: np.ndarray, removed_edges: np.ndarray, degree_ids: np.ndarray, out_degree_deltas: np.ndarray, in_degree_deltas: np.ndarray):
+        # Every id is an original page ID, so the two snapshots do not need the same vertex numbering
+        self.added_articles = added_articles
+        self.removed_articles = removed_articles
+        self.added_titles = added_titles
+        self.removed_titles = removed_titles
+        self.added_edges = added_edges  # (n, 2) source, target
+        self.removed_edges = removed_edges
+        # Only the articles whose degree changed
+        self.degree_ids = degree_ids
+        self.out_degree_deltas = out_degree_deltas
+        self.in_degree_deltas = in_degree_deltas
+
+    @staticmethod
+    def compute(old_graph: Graph, new_graph: Graph, batch_size: int = 1000000) -> "WikiSnapshotDiff":
+        # Memory: one int64 key per distinct edge of each snapshot, a few per-vertex arrays and one batch of batch_size edges
+        start_time = time.time()
+        old_ids, old_keys = WikiSnapshotDiff.__snapshot_arrays(old_graph, batch_size)
+        new_ids, new_keys = WikiSnapshotDiff.__snapshot_arrays(new_graph, batch_size)
+
+        # Articles: compared as sorted IDs, the sort order gives back the vertices for the titles
+        old_order = np.argsort(old_ids, kind="stable")
+        new_order = np.argsort(new_ids, kind="stable")
+        added_articles = sorted_difference(new_ids[new_order], old_ids[old_order])
+        removed_articles = sorted_difference(old_ids[old_order], new_ids[new_order])
+        new_titles = new_graph.vs["title"]
+        old_titles = old_graph.vs["title"]
+        added_titles = [new_titles[i] for i in new_order[np.searchsorted(new_ids[new_order], added_articles)]]
+        removed_titles = [old_titles[i] for i in old_order[np.searchsorted(old_ids[old_order], removed_articles)]]
+
+        # Edges: merge of the sorted (source << 32 | target) keys
+        added_keys = sorted_difference(new_keys, old_keys)
+        removed_keys = sorted_difference(old_keys, new_keys)
+
+        # Degrees (as reported by the graphs) over the union of the articles
+        ids = np.union1d(old_ids, new_ids)
+        old_out, old_in = WikiSnapshotDiff.__degrees(ids, old_ids, old_graph)
+        new_out, new_in = WikiSnapshotDiff.__degrees(ids, new_ids, new_graph)
+        out_deltas = new_out - old_out
+        in_deltas = new_in - old_in
+        changed = (out_deltas != 0) | (in_deltas != 0)
+
+        diff = WikiSnapshotDiff(added_articles, removed_articles, added_titles, removed_titles,
+                                WikiSnapshotDiff.__decode(added_keys), WikiSnapshotDiff.__decode(removed_keys),
+                                ids[changed], out_deltas[changed], in_deltas[changed])
+        print(f"Snapshots compared in {time.time() - start_time:.2f} seconds")
+        diff.print_summary()
+        return diff
+
+    def print_summary(self):
+        print(f"Articles: +{len(self.added_articles)} -{len(self.removed_articles)}")
+        print(f"Links: +{len(self.added_edges)} -{len(self.removed_edges)}")
+        print(f"Articles with a degree change: {len(self.degree_ids)}")
+
+    def top_degree_changes(self, k: int = 10, mode: str = "in") -> list[tuple[int, int]]:
+        # [(original_id, delta)] of the largest absolute degree changes
+        deltas = self.in_degree_deltas if mode == "in" else self.out_degree_deltas
+        top = np.argsort(-np.abs(deltas), kind="stable")[:k]
+        return list(zip(self.degree_ids[top].tolist(), deltas[top].tolist()))
+
+    def save(self, output_path: str):
+        np.savez_compressed(output_path + ".delta.npz",
+                            added_articles=self.added_articles, removed_articles=self.removed_articles,
+                            added_titles=np.array(self.added_titles, dtype=str), removed_titles=np.array(self.removed_titles, dtype=str),
+                            added_edges=self.added_edges, removed_edges=self.removed_edges,
+                            degree_ids=self.degree_ids, out_degree_deltas=self.out_degree_deltas, in_degree_deltas=self.in_degree_deltas)
+
+    @staticmethod
+    def load(input_path: str) -> "WikiSnapshotDiff":
+        data = np.load(input_path + ".delta.npz")
+        return WikiSnapshotDiff(data["added_articles"], data["removed_articles"], data["added_titles"].tolist(), data["removed_titles"].tolist(),
+                                data["added_edges"], data["removed_edges"], data["degree_ids"], data["out_degree_deltas"], data["in_degree_deltas"])
+
+    @staticmethod
+    def __snapshot_arrays(graph: Graph, batch_size: int) -> tuple[np.ndarray, np.ndarray]:
+        ids = np.array(graph.vs["original_id"], dtype=np.int64)
+        return ids, edge_keys(graph, ids, batch_size)
+
+    @staticmethod
+    def __degrees(ids: np.ndarray, graph_ids: np.ndarray, graph: Graph) -> tuple[np.ndarray, np.ndarray]:
+        out_degrees = np.zeros(len(ids), dtype=np.int64)
+        in_degrees = np.zeros(len(ids), dtype=np.int64)
+        positions = np.searchsorted(ids, graph_ids)
+        out_degrees[positions] = graph.outdegree()
+        in_degrees[positions] = graph.indegree()
+        return out_degrees, in_degrees
+
+    @staticmethod
+    def __decode(keys: np.ndarray) -> np.ndarray:
+        return np.column_stack((keys >> 32, keys & 0xFFFFFFFF))
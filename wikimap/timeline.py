@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+import numpy as np
+
+# Death timestamp of the edges still present in the last revision
+ALIVE = np.iinfo(np.int64).max
+
+
+class WikiEdgeTimeline:
+    def __init__(self, sources: np.ndarray, targets: np.ndarray, births: np.ndarray, deaths: np.ndarray):
+        # One row per lifetime of an edge: [birth, death) in seconds since epoch, ids are original page ids
+        self.sources = sources
+        self.targets = targets
+        self.births = births
+        self.deaths = deaths
+
+    def __len__(self):
+        return len(self.sources)
+
+    def snapshot(self, date: datetime) -> np.ndarray:
+        # Edges (source, target) present at the given date
+        timestamp = self.to_timestamp(date)
+        alive = (self.births <= timestamp) & (self.deaths > timestamp)
+        return np.column_stack((self.sources[alive], self.targets[alive]))
+
+    def save(self, output_path: str):
+        np.savez_compressed(output_path + ".timeline.npz", sources=self.sources, targets=self.targets, births=self.births, deaths=self.deaths)
+
+    @staticmethod
+    def load(input_path: str) -> "WikiEdgeTimeline":
+        data = np.load(input_path + ".timeline.npz")
+        return WikiEdgeTimeline(data["sources"], data["targets"], data["births"], data["deaths"])
+
+    @staticmethod
+    def to_timestamp(date: datetime) -> int:
+        # Naive dates are considered UTC, as the dump timestamps
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return int(date.timestamp())
+
+    @staticmethod
+    def from_events(sources: np.ndarray, targets: np.ndarray, timestamps: np.ndarray, kinds: np.ndarray) -> "WikiEdgeTimeline":
+        # Events are +1 (link added) / -1 (link removed); several link titles can resolve to the same target
+        # (e.g. an article and its redirect), so an edge is alive while its number of links is positive
+        if len(sources) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return WikiEdgeTimeline(empty, empty, empty, empty)
+        order = np.lexsort((-kinds, timestamps, targets, sources))
+        sources, targets, timestamps, kinds = sources[order], targets[order], timestamps[order], kinds[order].astype(np.int64)
+
+        new_group = np.r_[True, (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])]
+        counts = np.cumsum(kinds)
+        group_start = np.flatnonzero(new_group)
+        group_offset = np.repeat(counts[group_start] - kinds[group_start], np.diff(np.r_[group_start, len(kinds)]))
+        counts -= group_offset
+        previous = counts - kinds
+
+        births = (previous <= 0) & (counts > 0)
+        deaths = (previous > 0) & (counts <= 0)
+        transitions = np.flatnonzero(births | deaths)
+        # Births and deaths alternate within an edge: a birth is closed by the next transition if it belongs to the same edge
+        groups = np.cumsum(new_group)[transitions]
+        is_birth = births[transitions]
+        closed = np.zeros(len(transitions), dtype=bool)
+        closed[:-1] = is_birth[:-1] & (groups[1:] == groups[:-1])
+        death_timestamps = np.full(len(transitions), ALIVE, dtype=np.int64)
+        death_timestamps[:-1][closed[:-1]] = timestamps[transitions[1:][closed[:-1]]]
+        birth_positions = transitions[is_birth]
+        return WikiEdgeTimeline(sources[birth_positions], targets[birth_positions], timestamps[birth_positions], death_timestamps[is_birth])
@@ -0,0 +1,279 @@
+import json
+import hashlib
+from os import path, makedirs
+from collections import OrderedDict
+import numpy as np
+from igraph import Graph
+
+
+class WikiVisualizer:
+    def __init__(self, graph: Graph, cache_size: int = 32, large_graph_threshold: int = 1000):
+        self.graph = graph
+        self.cache_size = cache_size
+        # Above this number of nodes the O(n²) Fruchterman-Reingold layout is replaced by DrL
+        self.large_graph_threshold = large_graph_threshold
+        self.layouts = OrderedDict()  # node set key -> coordinates sorted by original_id
+
+    def layout(self, subgraph: Graph, key: str = None) -> np.ndarray:
+        # Coordinates are cached by node set, so they do not depend on the order of the vertices in the subgraph
+        original_ids = np.array(subgraph.vs["original_id"], dtype=np.int64)
+        order = np.argsort(original_ids, kind="stable")
+        if key is None:
+            key = self.node_set_key(original_ids)
+
+        if key in self.layouts:
+            self.layouts.move_to_end(key)
+            sorted_coords = self.layouts[key]
+        else:
+            if subgraph.vcount() < self.large_graph_threshold:
+                coords = np.array(subgraph.layout("fr").coords, dtype=np.float64)
+            else:
+                coords = np.array(subgraph.layout_drl().coords, dtype=np.float64)
+            sorted_coords = coords[order] if len(coords) else np.zeros((0, 2))
+            self.layouts[key] = sorted_coords
+            if len(self.layouts) > self.cache_size:
+                self.layouts.popitem(last=False)
+
+        coords = np.empty_like(sorted_coords)
+        coords[order] = sorted_coords
+        return coords
+
+    def node_set_key(self, original_ids) -> str:
+        ids = np.unique(np.asarray(original_ids, dtype=np.int64))
+        return hashlib.sha1(ids.tobytes()).hexdigest()
+
+    def collapse(self, subgraph: Graph, max_nodes: int, keep: tuple = ()) -> Graph:
+        # Keep the max_nodes most connected nodes and merge every other node into a cluster
+        # attached to its most important kept neighbour (or into a single cluster if it has none)
+        n = subgraph.vcount()
+        importance = np.array(subgraph.degree(), dtype=np.int64)
+        titles = subgraph.vs["title"]
+        original_ids = np.array(subgraph.vs["original_id"], dtype=np.int64)
+        edges = np.array(subgraph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+
+        kept = np.zeros(n, dtype=bool)
+        if n <= max_nodes:
+            kept[:] = True
+        else:
+            kept[np.argsort(-importance, kind="stable")[:max_nodes]] = True
+            kept[list(keep)] = True
+        kept_ids = np.flatnonzero(kept)
+
+        # New ids: kept nodes first, then one cluster per anchor
+        new_ids = np.full(n, -1, dtype=np.int64)
+        new_ids[kept_ids] = np.arange(len(kept_ids))
+
+        # Anchor of each dropped node: kept neighbour of highest importance (edges taken in both directions)
+        pairs = np.concatenate([edges, edges[:, ::-1]])
+        pairs = pairs[~kept[pairs[:, 0]] & kept[pairs[:, 1]]]
+        anchors = np.full(n, -1, dtype=np.int64)
+        if len(pairs):
+            pairs = pairs[np.lexsort((importance[pairs[:, 1]], pairs[:, 0]))]
+            last = np.r_[pairs[1:, 0] != pairs[:-1, 0], True]
+            anchors[pairs[last, 0]] = pairs[last, 1]
+
+        dropped = np.flatnonzero(~kept)
+        cluster_anchors, cluster_of_dropped, cluster_sizes = np.unique(anchors[dropped], return_inverse=True, return_counts=True)
+        new_ids[dropped] = len(kept_ids) + cluster_of_dropped
+
+        # Remap the edges, drop the ones inside a cluster and merge the parallel ones
+        remapped = new_ids[edges]
+        remapped = remapped[remapped[:, 0] != remapped[:, 1]]
+        remapped, weights = np.unique(remapped, axis=0, return_counts=True)
+
+        collapsed = Graph(directed=subgraph.is_directed())
+        collapsed.add_vertices(len(kept_ids) + len(cluster_anchors))
+        cluster_titles = [f"{titles[anchor]} (+{size})" if anchor >= 0 else f"Others (+{size})" for anchor, size in zip(cluster_anchors, cluster_sizes)]
+        collapsed.vs["title"] = [titles[i] for i in kept_ids] + cluster_titles
+        # Clusters get negative ids derived from their anchor so the layout cache stays keyed by node set
+        collapsed.vs["original_id"] = original_ids[kept_ids].tolist() + [-int(original_ids[anchor]) - 1 if anchor >= 0 else -(2 ** 62) for anchor in cluster_anchors]
+        collapsed.vs["size"] = [1] * len(kept_ids) + cluster_sizes.tolist()
+        collapsed.vs["cluster"] = [False] * len(kept_ids) + [True] * len(cluster_anchors)
+        collapsed.add_edges(remapped.tolist())
+        collapsed.es["weight"] = weights.tolist()
+        return collapsed
+
+    def prepare(self, subgraph: Graph, max_nodes: int, keep: tuple = ()) -> tuple[Graph, np.ndarray]:
+        collapsed = self.collapse(subgraph, max_nodes, keep)
+        # The nodes always kept (the ego) change the collapsed graph as much as the node set does
+        original_ids = subgraph.vs["original_id"]
+        kept_ids = ",".join(str(i) for i in sorted(original_ids[v] for v in keep))
+        key = f"{self.node_set_key(original_ids)}:{max_nodes}:{kept_ids}"
+        return collapsed, self.layout(collapsed, key)
+
+    def export_html(self, subgraph: Graph, output_path: str, ego_title: str = None, max_nodes: int = 500, chunk_size: int = 200):
+        ego = [v.index for v in subgraph.vs if v["title"].lower() == ego_title]
+        view, coords = self.prepare(subgraph, max_nodes, ego)
+        n = view.vcount()
+        print(f"Exporting {n} nodes ({sum(view.vs['cluster'])} clusters) and {view.ecount()} edges")
+
+        # Scale the layout to a fixed box and round it, the page uses it as is (preset layout)
+        if n:
+            coords = coords - coords.min(axis=0)
+            span = coords.max(axis=0)
+            span[span == 0] = 1
+            coords = np.rint(coords / span * 1000).astype(np.int64)
+
+        titles = view.vs["title"]
+        sizes = view.vs["size"]
+        clusters = view.vs["cluster"]
+        kinds = [2 if clusters[i] else 1 if titles[i].lower() == ego_title else 0 for i in range(n)]
+
+        # Most important nodes (ego first, then by weighted degree) are sent in the first chunks
+        importance = np.array(view.strength(weights="weight"), dtype=np.float64) if view.ecount() else np.zeros(n)
+        importance[[i for i in range(n) if kinds[i] == 1]] = np.inf
+        order = np.argsort(-importance, kind="stable")
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        node_chunk = rank // chunk_size
+
+        # An edge is sent with the chunk of its last loaded endpoint
+        edges = np.array(view.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        weights = np.array(view.es["weight"] if view.ecount() else [], dtype=np.int64)
+        edge_chunk = np.maximum(node_chunk[edges[:, 0]], node_chunk[edges[:, 1]]) if len(edges) else np.zeros(0, dtype=np.int64)
+        chunk_count = int(node_chunk.max()) + 1 if n else 0
+
+        data_directory = path.splitext(output_path)[0] + "_data"
+        makedirs(data_directory, exist_ok=True)
+        for chunk in range(chunk_count):
+            nodes = order[chunk * chunk_size:(chunk + 1) * chunk_size]
+            in_chunk = edge_chunk == chunk
+            data = {
+                # Column arrays: id, label, x, y, size, kind (0 = article, 1 = ego, 2 = cluster)
+                "n": [
+                    nodes.tolist(),
+                    [titles[i] for i in nodes],
+                    coords[nodes, 0].tolist(),
+                    coords[nodes, 1].tolist(),
+                    [sizes[i] for i in nodes],
+                    [kinds[i] for i in nodes],
+                ],
+                # Flattened source/target pairs and their weights (number of merged edges)
+                "e": edges[in_chunk].ravel().tolist(),
+                "w": weights[in_chunk].tolist(),
+            }
+            with open(path.join(data_directory, f"chunk_{chunk}.js"), "w", encoding="utf-8") as f:
+                f.write(f"wikimapChunk({json.dumps(data, ensure_ascii=False, separators=(',', ':'))});")
+
+        stylesheet = [
+            {
+                'selector': 'node',
+                'style': {
+                    'label': 'data(label)',
+                    'background-color': 'lightblue',
+                    'color': 'black',
+                    'text-valign': 'center',
+                    'text-halign': 'center',
+                    'font-size': '12px',
+                    # Labels are hidden when they would be rendered too small
+                    'min-zoomed-font-size': 8,
+                    'width': 'mapData(size, 1, 100, 20, 80)',
+                    'height': 'mapData(size, 1, 100, 20, 80)'
+                }
+            },
+            {
+                'selector': 'node.ego',
+                'style': {
+                    'background-color': 'red'
+                }
+            },
+            {
+                'selector': 'node.cluster',
+                'style': {
+                    'background-color': 'orange',
+                    'shape': 'round-rectangle'
+                }
+            },
+            {
+                'selector': 'edge',
+                'style': {
+                    'line-color': 'gray',
+                    'width': 'mapData(weight, 1, 50, 1, 6)'
+                }
+            }
+        ]
+
+        html_content = f"""
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Graph Visualization</title>
+            <script src="https://cdn.jsdelivr.net/npm/cytoscape@3.22.0/dist/cytoscape.min.js"></script>
+            <style>
+                body {{
+                    font-family: Arial, sans-serif;
+                    margin: 0;
+                    padding: 0;
+                    display: flex;
+                    justify-content: center;
+                    align-items: center;
+                    height: 100vh;
+                    background-color: #f0f0f0;
+                }}
+                #cy {{
+                    width: 80%;
+                    height: 80%;
+                    border: 1px solid #ccc;
+                    border-radius: 8px;
+                    background-color: white;
+                }}
+            </style>
+        </head>
+        <body>
+            <div id="cy"></div>
+
+            <script>
+                var cy = cytoscape({{
+                    container: document.getElementById('cy'),
+                    elements: [],
+                    layout: {{ name: 'preset' }},
+                    style: {json.dumps(stylesheet)},
+                    hideEdgesOnViewport: true,
+                    textureOnViewport: true,
+                }});
+
+                var chunkCount = {chunk_count};
+                var nextChunk = 0;
+
+                // Called by every data chunk, the next chunk is only requested once this one is drawn
+                function wikimapChunk(data) {{
+                    var elements = [];
+                    var n = data.n;
+                    for (var i = 0; i < n[0].length; i++) {{
+                        elements.push({{
+                            group: 'nodes',
+                            data: {{ id: String(n[0][i]), label: n[1][i], size: n[4][i] }},
+                            position: {{ x: n[2][i], y: n[3][i] }},
+                            classes: n[5][i] === 1 ? 'ego' : n[5][i] === 2 ? 'cluster' : ''
+                        }});
+                    }}
+                    for (var j = 0; j < data.e.length; j += 2) {{
+                        elements.push({{ group: 'edges', data: {{ source: String(data.e[j]), target: String(data.e[j + 1]), weight: data.w[j / 2] }} }});
+                    }}
+                    cy.batch(function () {{ cy.add(elements); }});
+                    if (nextChunk === 1) {{
+                        cy.fit();
+                    }}
+                    window.requestAnimationFrame(loadNextChunk);
+                }}
+
+                function loadNextChunk() {{
+                    if (nextChunk >= chunkCount) {{
+                        return;
+                    }}
+                    var script = document.createElement('script');
+                    script.src = {json.dumps(path.basename(data_directory))} + '/chunk_' + nextChunk + '.js';
+                    nextChunk++;
+                    document.body.appendChild(script);
+                }}
+
+                loadNextChunk();
+            </script>
+        </body>
+        </html>
+        """
+
+        with open(output_path, 'w', encoding="utf-8") as f:
+            f.write(html_content)